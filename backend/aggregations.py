@@ -0,0 +1,116 @@
+from datetime import datetime
+from typing import Optional
+from dates import as_utc
+
+# Server-side $match/$group pipelines over the transactions collection. Only
+# the grouped rows cross the wire, there is no row cap, and the leading
+# {"user_id": ...} match (plus optional date range) is served by the
+# user_id_date_id index.
+
+def match_stage(user_id: str, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> dict:
+    match = {"user_id": user_id}
+    if start_date or end_date:
+        match['date'] = {}
+        if start_date:
+            match['date']['$gte'] = as_utc(start_date)
+        if end_date:
+            match['date']['$lt'] = as_utc(end_date)
+    return {"$match": match}
+
+# Dates are BSON dates in UTC. $toDate is a no-op for them and also accepts
+# the ISO strings older releases wrote, so rollup rebuilds work before
+# `manage.py migrate-dates` has finished.
+MONTH_EXPR = {"$dateToString": {"format": "%Y-%m", "date": {"$toDate": "$date"}}}
+
+TOTALS = {
+    "total": {"$sum": "$amount"},
+    "count": {"$sum": 1},
+    "points": {"$sum": "$points_earned"},
+}
+
+def category_month_pipeline(match: dict) -> list:
+    return [
+        match,
+        {"$group": {"_id": {"category": "$category", "month": MONTH_EXPR}, **TOTALS}},
+    ]
+
+# Transactions written before merchant_key existed group by their
+# lower-cased name until `manage.py backfill-merchant-keys` has run, rather
+# than all collapsing into one null merchant.
+MERCHANT_KEY_EXPR = {"$ifNull": ["$merchant_key", {"$toLower": {"$trim": {"input": "$merchant"}}}]}
+
+def merchant_pipeline(match: dict) -> list:
+    return [
+        match,
+        # Oldest first so $first picks the merchant's original name/category/card.
+        {"$sort": {"date": 1, "id": 1}},
+        {"$group": {
+            "_id": MERCHANT_KEY_EXPR,
+            **TOTALS,
+            "avg_amount": {"$avg": "$amount"},
+            "merchant": {"$first": "$merchant"},
+            "category": {"$first": "$category"},
+            "card_id": {"$first": "$card_id"},
+        }},
+    ]
+
+def card_pipeline(match: dict) -> list:
+    return [
+        match,
+        {"$group": {
+            "_id": "$card_id",
+            **TOTALS,
+            "last_used": {"$max": "$date"},
+        }},
+    ]
+
+async def _run(db, pipeline: list) -> list:
+    return await db.transactions.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+async def category_month_totals(db, user_id: str, start_date=None, end_date=None) -> list:
+    return await _run(db, category_month_pipeline(match_stage(user_id, start_date, end_date)))
+
+async def merchant_stats(db, user_id: str, start_date=None, end_date=None) -> list:
+    return await _run(db, merchant_pipeline(match_stage(user_id, start_date, end_date)))
+
+async def card_usage(db, user_id: str, start_date=None, end_date=None) -> list:
+    return await _run(db, card_pipeline(match_stage(user_id, start_date, end_date)))
+
+async def spending_breakdown(db, user_id: str, start_date=None, end_date=None) -> dict:
+    """Category, month, merchant and card aggregates for a date range"""
+    category_rows = await category_month_totals(db, user_id, start_date, end_date)
+    merchant_rows = await merchant_stats(db, user_id, start_date, end_date)
+    card_rows = await card_usage(db, user_id, start_date, end_date)
+
+    category_totals = {}
+    monthly_totals = {}
+    for row in category_rows:
+        category, month = row['_id']['category'], row['_id']['month']
+        category_totals[category] = category_totals.get(category, 0) + row['total']
+        monthly_totals[month] = monthly_totals.get(month, 0) + row['total']
+
+    return {
+        "category_totals": {k: round(v, 2) for k, v in category_totals.items()},
+        "monthly_totals": {k: round(v, 2) for k, v in sorted(monthly_totals.items())},
+        "merchants": sorted([
+            {
+                "merchant": row['merchant'],
+                "merchant_key": row['_id'],
+                "count": row['count'],
+                "total": round(row['total'], 2),
+                "avg_amount": round(row['avg_amount'], 2),
+                "category": row['category'],
+            }
+            for row in merchant_rows
+        ], key=lambda m: m['total'], reverse=True),
+        "cards": [
+            {
+                "card_id": row['_id'],
+                "count": row['count'],
+                "total": round(row['total'], 2),
+                "points": row['points'],
+                "last_used": row['last_used'],
+            }
+            for row in card_rows
+        ],
+    }
@@ -1,19 +1,47 @@
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import asyncio
 import os
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt is CPU-bound and releases the GIL, so it runs on a small dedicated
+# pool instead of blocking the event loop. The pool size caps how many
+# hashes run at once; extra logins queue here rather than starving workers.
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
 
 JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'default-secret-key')
 JWT_ALGORITHM = os.environ.get('JWT_ALGORITHM', 'HS256')
 JWT_EXPIRE_MINUTES = int(os.environ.get('JWT_EXPIRE_MINUTES', 10080))
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+# When enabled, tokens carry the user's profile as signed claims and
+# get_current_user trusts them instead of loading the user from Mongo.
+AUTH_TRUST_TOKEN_CLAIMS = os.environ.get('AUTH_TRUST_TOKEN_CLAIMS', 'false').lower() == 'true'
+PRINCIPAL_CACHE_SIZE = int(os.environ.get('PRINCIPAL_CACHE_SIZE', 10000))
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.environ.get('PRINCIPAL_CACHE_TTL_SECONDS', 60))
+
+PRINCIPAL_CLAIMS = ("email", "name", "created_at")
+
+async def hash_password(password: str) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, pwd_context.hash, password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash). new_hash is set when the stored hash uses
+    an outdated scheme or cost factor and should be written back."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+def shutdown_password_executor():
+    _password_executor.shutdown(wait=False)
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -22,6 +50,21 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
+def create_user_token(user: dict) -> str:
+    claims = {"sub": user['id']}
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        for claim in PRINCIPAL_CLAIMS:
+            value = user[claim]
+            claims[claim] = value.isoformat() if isinstance(value, datetime) else value
+    return create_access_token(claims)
+
+def principal_from_claims(payload: dict):
+    if not AUTH_TRUST_TOKEN_CLAIMS or not all(claim in payload for claim in PRINCIPAL_CLAIMS):
+        return None
+    principal = {claim: payload[claim] for claim in PRINCIPAL_CLAIMS}
+    principal['id'] = payload['sub']
+    return principal
+
 def decode_access_token(token: str):
     try:
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
@@ -0,0 +1,78 @@
+"""Spending-level clustering: exact ckmeans vs. the old sklearn KMeans path.
+
+Clusters synthetic per-user category totals into 3 levels and reports the
+mean time per user, plus the within-cluster sum of squares of each method
+(ckmeans is optimal, so KMeans can only match or exceed it).
+
+Usage:
+    python benchmarks/bench_clustering.py --users 2000 --categories 12
+"""
+from pathlib import Path
+import argparse
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from clustering import ckmeans
+
+def within_ss(values, labels):
+    total = 0.0
+    for label in set(labels):
+        members = [v for v, l in zip(values, labels) if l == label]
+        mean = sum(members) / len(members)
+        total += sum((v - mean) ** 2 for v in members)
+    return total
+
+def make_users(count, categories, seed):
+    rng = random.Random(seed)
+    return [[round(rng.lognormvariate(8, 1.2), 2) for _ in range(categories)] for _ in range(count)]
+
+def bench_ckmeans(users, k):
+    start = time.perf_counter()
+    labels = [ckmeans(values, k) for values in users]
+    elapsed = time.perf_counter() - start
+    return elapsed, labels
+
+def bench_kmeans(users, k):
+    try:
+        from sklearn.cluster import KMeans
+        import numpy as np
+    except ImportError:
+        return None, None
+    start = time.perf_counter()
+    labels = []
+    for values in users:
+        model = KMeans(n_clusters=min(k, len(values)), random_state=42, n_init=10)
+        labels.append(list(model.fit_predict(np.array(values).reshape(-1, 1))))
+    return time.perf_counter() - start, labels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--categories", type=int, default=12)
+    parser.add_argument("--clusters", type=int, default=3)
+    parser.add_argument("--kmeans-users", type=int, default=200,
+                        help="KMeans is slow; time it on this many users and scale per user")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    users = make_users(args.users, args.categories, args.seed)
+
+    elapsed, ck_labels = bench_ckmeans(users, args.clusters)
+    print(f"ckmeans:       {elapsed / len(users) * 1e6:9.1f} us/user  ({len(users)} users)")
+
+    sample = users[:args.kmeans_users]
+    elapsed, km_labels = bench_kmeans(sample, args.clusters)
+    if elapsed is None:
+        print("KMeans:        skipped (scikit-learn not installed)")
+        return
+    print(f"KMeans n_init=10: {elapsed / len(sample) * 1e6:6.1f} us/user  ({len(sample)} users)")
+
+    ck_ss = sum(within_ss(v, l) for v, l in zip(sample, ck_labels))
+    km_ss = sum(within_ss(v, l) for v, l in zip(sample, km_labels))
+    print(f"Within-cluster SS over sample: ckmeans={ck_ss:.4g} KMeans={km_ss:.4g}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Cold-start budget check for the backend.
+
+Imports `server` in fresh interpreters and fails (exit 1) when the median
+import time exceeds the budget, so a heavy top-level import shows up in CI
+instead of in autoscaling latency. Use `python manage.py profile-imports`
+to find the culprit.
+
+Usage:
+    python benchmarks/bench_cold_start.py --budget-ms 1500 --runs 5
+"""
+from pathlib import Path
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+def time_import(module: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=BACKEND_DIR, check=True)
+    return (time.perf_counter() - start) * 1000
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_import("sys") for _ in range(args.runs))
+    samples = [time_import(args.module) for _ in range(args.runs)]
+    median = statistics.median(samples)
+
+    print(f"Interpreter startup: {baseline:.0f} ms (median of {args.runs})")
+    print(f"import {args.module}: {median:.0f} ms median, {max(samples):.0f} ms max "
+          f"({median - baseline:.0f} ms over bare interpreter)")
+    print(f"Budget: {args.budget_ms:.0f} ms")
+
+    if median > args.budget_ms:
+        print("FAIL: cold start over budget")
+        return 1
+    print("OK")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Login throughput and collateral latency under a burst of concurrent logins.
+
+Runs against a live backend. While `--concurrency` threads log in as fast as
+they can, a probe thread keeps calling an unrelated endpoint and records its
+latency. With bcrypt on the event loop the probe p99 tracks the bcrypt cost;
+with hashing on the thread pool it stays close to the idle baseline.
+
+Usage:
+    python benchmarks/bench_login_concurrency.py --base-url http://localhost:8001/api
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import statistics
+import threading
+import time
+import uuid
+import requests
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def ensure_user(base_url, email, password):
+    response = requests.post(f"{base_url}/auth/signup", json={
+        "email": email, "name": "Benchmark User", "password": password
+    }, timeout=30)
+    if response.status_code not in (200, 400):
+        raise SystemExit(f"Signup failed: {response.status_code} {response.text[:200]}")
+
+def probe_latencies(url, stop, samples):
+    session = requests.Session()
+    while not stop.is_set():
+        start = time.perf_counter()
+        session.get(url, timeout=30)
+        samples.append((time.perf_counter() - start) * 1000)
+
+def login_worker(base_url, email, password, stop, counts):
+    session = requests.Session()
+    while not stop.is_set():
+        response = session.post(f"{base_url}/auth/login", json={"email": email, "password": password}, timeout=60)
+        counts.append(response.status_code)
+
+def measure_probe(url, seconds):
+    stop = threading.Event()
+    samples = []
+    thread = threading.Thread(target=probe_latencies, args=(url, stop, samples))
+    thread.start()
+    time.sleep(seconds)
+    stop.set()
+    thread.join()
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8001/api")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--probe-path", default="/referrals/all-cards")
+    args = parser.parse_args()
+
+    email = f"bench_{uuid.uuid4().hex[:8]}@credmax.test"
+    password = "benchmark-password"
+    ensure_user(args.base_url, email, password)
+    probe_url = f"{args.base_url}{args.probe_path}"
+
+    baseline = measure_probe(probe_url, min(args.duration, 5.0))
+
+    stop = threading.Event()
+    statuses = []
+    probe_samples = []
+    probe = threading.Thread(target=probe_latencies, args=(probe_url, stop, probe_samples))
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(login_worker, args.base_url, email, password, stop, statuses)
+        probe.start()
+        started = time.perf_counter()
+        time.sleep(args.duration)
+        stop.set()
+    probe.join()
+    elapsed = time.perf_counter() - started
+
+    ok = sum(1 for status in statuses if status == 200)
+    print(f"Concurrent logins:      {args.concurrency}")
+    print(f"Login throughput:       {ok / elapsed:.1f} logins/s ({ok} ok, {len(statuses) - ok} failed)")
+    print(f"Probe {args.probe_path} idle:     p50={percentile(baseline, 50):.1f}ms p99={percentile(baseline, 99):.1f}ms")
+    print(f"Probe {args.probe_path} loaded:   p50={percentile(probe_samples, 50):.1f}ms "
+          f"p99={percentile(probe_samples, 99):.1f}ms mean={statistics.fmean(probe_samples or [0]):.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""List response serialization: model + response_model vs. serialization.py.
+
+Encodes synthetic transaction documents, shaped as they come out of Mongo,
+three ways and reports the time per response:
+
+- models:    TransactionResponse(**t) per row, then what FastAPI does for
+             response_model (dump, validate again, dump to JSON-able
+             python, json.dumps)
+- validated: one pydantic-core validate + dump_json (RESPONSE_TRUST_DB=false)
+- trusted:   orjson straight from the documents (the default)
+
+plus the gzip cost and ratio for the body.
+
+Usage:
+    python benchmarks/bench_serialization.py --rows 100 10000
+"""
+from pathlib import Path
+import argparse
+import gzip
+import json
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from pydantic import TypeAdapter
+from typing import List
+from models import TransactionResponse
+import serialization
+
+def make_documents(count, seed):
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": "user-1",
+            "card_id": f"card-{rng.randint(1, 5)}",
+            "amount": round(rng.lognormvariate(6, 1.2), 2),
+            "category": rng.choice(["Dining", "Travel", "Groceries", "Fuel", "Shopping"]),
+            "merchant": f"Merchant {rng.randint(1, 300)}",
+            "points_earned": rng.randint(0, 500),
+            "date": (start + timedelta(minutes=rng.randint(0, 500000))).isoformat(),
+        }
+        for _ in range(count)
+    ]
+
+ADAPTER = TypeAdapter(List[TransactionResponse])
+
+def encode_models(docs):
+    rows = []
+    for t in docs:
+        t = dict(t)
+        t['date'] = datetime.fromisoformat(t['date'])
+        rows.append(TransactionResponse(**t))
+    prepared = [row.model_dump() for row in rows]
+    validated = ADAPTER.validate_python(prepared)
+    content = ADAPTER.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+def encode_validated(docs):
+    return ADAPTER.dump_json(ADAPTER.validate_python(docs))
+
+def encode_trusted(docs):
+    return serialization.dumps(docs)
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for count in args.rows:
+        docs = make_documents(count, args.seed)
+        print(f"{count} rows")
+        baseline = None
+        for name, fn in (("models", encode_models), ("validated", encode_validated), ("trusted", encode_trusted)):
+            elapsed, body = timed(lambda: fn(docs), args.repeat)
+            baseline = baseline or elapsed
+            print(f"  {name:10s} {elapsed * 1000:9.3f} ms  {len(body):>9} bytes  ({baseline / elapsed:.1f}x)")
+        elapsed, compressed = timed(lambda: gzip.compress(body, compresslevel=serialization.RESPONSE_GZIP_LEVEL), args.repeat)
+        print(f"  {'gzip':10s} {elapsed * 1000:9.3f} ms  {len(compressed):>9} bytes  ({len(body) / len(compressed):.1f}x smaller)")
+
+if __name__ == "__main__":
+    main()
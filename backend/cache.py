@@ -0,0 +1,144 @@
+from collections import OrderedDict
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Every named cache registers itself here so routes/metrics.py can report on it.
+CACHES = {}
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Not thread-safe: it is meant to be used from the event loop only.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 300, register: bool = True):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        if register:
+            CACHES[name] = self
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl: float = None):
+        self._data[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+class VersionedCache:
+    """Caches computed values tagged with the data version they were built
+    from. A lookup with the current version either hits or recomputes; with
+    stale_while_revalidate an outdated entry is served immediately while a
+    background task rebuilds it.
+    """
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 3600, stale_while_revalidate: bool = False):
+        self.name = name
+        self.stale_while_revalidate = stale_while_revalidate
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._entries = TTLCache(name, maxsize=maxsize, ttl=ttl, register=False)
+        self._refreshing = {}
+        CACHES[name] = self
+
+    async def get_or_compute(self, key, version, compute, cacheable=None):
+        """Returns (value, stale). ``compute`` is a zero-argument coroutine
+        function; values for which ``cacheable(value)`` is false are returned
+        but not stored. ``stale`` is True when an entry built from an older
+        version was served while it is rebuilt, so the caller must not label
+        it with ``version`` (e.g. in an ETag)."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1], False
+
+        if entry is not None and self.stale_while_revalidate:
+            self.stale_hits += 1
+            self._refresh(key, version, compute, cacheable)
+            return entry[1], True
+
+        self.misses += 1
+        value = await compute()
+        if cacheable is None or cacheable(value):
+            self._entries.set(key, (version, value))
+        return value, False
+
+    def _refresh(self, key, version, compute, cacheable=None):
+        if key in self._refreshing:
+            return
+
+        async def refresh():
+            try:
+                value = await compute()
+                if cacheable is None or cacheable(value):
+                    self._entries.set(key, (version, value))
+            except Exception as e:
+                logger.warning(f"Background refresh of {self.name} {key} failed: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(refresh())
+
+    def invalidate(self, key):
+        self._entries.invalidate(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self._entries.maxsize,
+            "ttl_seconds": self._entries.ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self._entries.evictions,
+            "refreshing": len(self._refreshing),
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0,
+        }
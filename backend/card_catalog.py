@@ -0,0 +1,96 @@
+from pathlib import Path
+from merchants import normalize_merchant
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+CARD_CATALOG_PATH = os.environ.get('CARD_CATALOG_PATH', str(Path(__file__).parent / 'data' / 'card_offers.json'))
+# How often at most the file's mtime is checked for a hot reload.
+CARD_CATALOG_RELOAD_SECONDS = float(os.environ.get('CARD_CATALOG_RELOAD_SECONDS', 30))
+
+def card_key(bank: str, name: str) -> str:
+    """Bank + card name match key, insensitive to case and spacing"""
+    return " ".join(f"{bank} {name}".lower().split())
+
+def _serialize(payload) -> bytes:
+    # Same encoding FastAPI's JSONResponse uses.
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+class CardCatalog:
+    """Referral card offers loaded from a JSON file into lookup indexes.
+
+    The file is re-read when its mtime changes (checked at most every
+    ``reload_seconds``), so offers can be edited without a restart. A file
+    that fails to load leaves the previous catalog in place. ``version`` is
+    a hash of the file content and changes with every successful reload.
+    """
+
+    def __init__(self, path: str = CARD_CATALOG_PATH, reload_seconds: float = CARD_CATALOG_RELOAD_SECONDS):
+        self.path = Path(path)
+        self.reload_seconds = reload_seconds
+        self.version = None
+        self.offers = []
+        self.by_id = {}
+        self.by_category = {}
+        self.by_co_brand = {}
+        self.by_card_key = {}
+        self.listings = {}
+        self._mtime = None
+        self._checked_at = 0.0
+
+    def refresh(self):
+        """Reload if the file changed; cheap enough to call per request"""
+        now = time.monotonic()
+        if self.version is not None and now - self._checked_at < self.reload_seconds:
+            return
+        self._checked_at = now
+        try:
+            mtime = self.path.stat().st_mtime_ns
+            if mtime == self._mtime:
+                return
+            raw = self.path.read_bytes()
+            self._build(json.loads(raw), hashlib.sha256(raw).hexdigest()[:16])
+            self._mtime = mtime
+            logger.info(f"Loaded {len(self.offers)} card offers from {self.path} (version {self.version})")
+        except Exception as e:
+            if self.version is None:
+                raise
+            logger.error(f"Card catalog reload from {self.path} failed, keeping version {self.version}: {e}")
+
+    def _build(self, offers: list, version: str):
+        by_id, by_category, by_co_brand, by_card_key = {}, {}, {}, {}
+        for offer in offers:
+            if offer['id'] in by_id:
+                raise ValueError(f"Duplicate card offer id {offer['id']}")
+            by_id[offer['id']] = offer
+            by_card_key[card_key(offer['bank'], offer['name'])] = offer
+            for category in offer.get('categories', []):
+                by_category.setdefault(category, []).append(offer)
+            if offer.get('co_branded'):
+                by_co_brand.setdefault(normalize_merchant(offer['co_branded']), []).append(offer)
+        
+        co_branded = [offer for offer in offers if offer.get('co_branded')]
+        listings = {
+            "all": _serialize({"cards": offers}),
+            "co_branded": _serialize({"co_branded_cards": co_branded}),
+        }
+        
+        # Swap everything in at once so readers never see a half-built catalog.
+        self.offers, self.by_id, self.by_category = offers, by_id, by_category
+        self.by_co_brand, self.by_card_key, self.listings = by_co_brand, by_card_key, listings
+        self.version = version
+
+    def listing(self, name: str):
+        """(serialized body, strong ETag) of a static listing"""
+        return self.listings[name], f'"{self.version}-{name}"'
+
+card_catalog = CardCatalog()
+
+def get_card_catalog() -> CardCatalog:
+    """FastAPI dependency returning the current catalog"""
+    card_catalog.refresh()
+    return card_catalog
@@ -0,0 +1,13 @@
+# Card ranking rule shared by recommendations, the optimizer and the LLM
+# fallbacks: a card's bonus categories earn 1.5x its base reward rate.
+
+CATEGORY_BONUS = 1.5
+
+def effective_rate(card: dict, category: str) -> float:
+    return card['reward_rate'] * (CATEGORY_BONUS if category in card.get('categories', []) else 1)
+
+def best_card(cards: list, category: str):
+    """Highest effective rate for the category; ties keep the earlier card"""
+    if not cards:
+        return None
+    return max(cards, key=lambda c: effective_rate(c, category))
@@ -0,0 +1,76 @@
+# Vectorised form of the card_ranking rule for scoring many merchants at
+# once: a category x card matrix of effective rates is built once per
+# request, so the best card for every merchant comes from one argmax
+# instead of a max() over the cards per merchant.
+import numpy as np
+
+from card_ranking import CATEGORY_BONUS
+
+def rate_matrix(cards: list, categories: list) -> np.ndarray:
+    """Effective reward rate of every card (columns) in every category (rows)"""
+    row = {category: i for i, category in enumerate(categories)}
+    bonus = np.ones((len(categories), len(cards)))
+    for k, card in enumerate(cards):
+        for category in card.get('categories', []):
+            i = row.get(category)
+            if i is not None:
+                bonus[i, k] = CATEGORY_BONUS
+    base = np.array([card['reward_rate'] for card in cards], dtype=float)
+    return bonus * base
+
+def score_merchants(cards: list, merchants: list) -> list:
+    """Optimisation records for merchants that would earn more on another card.
+
+    ``merchants`` holds dicts with merchant, category, card_id (the card
+    currently used), total, count and optionally per_year, the payments per
+    year behind annual_gain_estimate (default 12). A merchant's current card
+    earns its base rate, or 1.0 if the card no longer exists; the
+    recommended card is the first with the highest effective rate for the
+    category. Records are returned in input order.
+    """
+    if not cards or not merchants:
+        return []
+    
+    # First card wins for duplicate ids, as with a linear search.
+    index_by_id = {}
+    for k, card in enumerate(cards):
+        index_by_id.setdefault(card['id'], k)
+    canonical = np.array([index_by_id[card['id']] for card in cards])
+    
+    categories = list({m['category'] for m in merchants})
+    category_row = {category: i for i, category in enumerate(categories)}
+    rates = rate_matrix(cards, categories)
+    best_by_category = rates.argmax(axis=1)
+    best_rate_by_category = rates[np.arange(len(categories)), best_by_category]
+    
+    rows = np.array([category_row[m['category']] for m in merchants])
+    current = np.array([index_by_id.get(m['card_id'], -1) for m in merchants])
+    avg_amount = np.array([m['total'] for m in merchants], dtype=float) / np.array([m['count'] for m in merchants], dtype=float)
+    
+    best = best_by_category[rows]
+    base = np.array([card['reward_rate'] for card in cards], dtype=float)
+    current_rate = np.where(current >= 0, base[current], 1.0)
+    current_points = np.trunc(avg_amount * current_rate)
+    optimized_points = np.trunc(avg_amount * best_rate_by_category[rows])
+    points_gain = optimized_points - current_points
+    
+    switch = (canonical[best] != current) & (points_gain > 0)
+    
+    records = []
+    for i in np.flatnonzero(switch):
+        merchant = merchants[i]
+        current_card = cards[current[i]] if current[i] >= 0 else None
+        best_card = cards[best[i]]
+        gain = int(points_gain[i])
+        records.append({
+            'merchant': merchant['merchant'],
+            'category': merchant['category'],
+            'avg_amount': round(float(avg_amount[i]), 2),
+            'current_card': f"{current_card['bank_name']} {current_card['card_name']}" if current_card else "Unknown",
+            'recommended_card': f"{best_card['bank_name']} {best_card['card_name']}",
+            'current_points': int(current_points[i]),
+            'optimized_points': int(optimized_points[i]),
+            'points_gain': gain,
+            'annual_gain_estimate': gain * merchant.get('per_year', 12)
+        })
+    return records
@@ -0,0 +1,73 @@
+"""Exact 1-D clustering (Ckmeans.1d.dp / Jenks natural breaks).
+
+For one-dimensional data the optimal k-means partition is a set of
+contiguous runs of the sorted values, so it can be found exactly by
+dynamic programming over split points instead of randomized restarts.
+Labels are ordered by level: 0 is the lowest-valued cluster.
+"""
+from typing import List, Sequence
+
+def _segment_cost(prefix_w: list, prefix: list, prefix_sq: list, start: int, end: int) -> float:
+    """Within-cluster sum of squares of the weighted points start..end"""
+    count = prefix_w[end + 1] - prefix_w[start]
+    total = prefix[end + 1] - prefix[start]
+    total_sq = prefix_sq[end + 1] - prefix_sq[start]
+    return total_sq - total * total / count
+
+def ckmeans(values: Sequence[float], k: int) -> List[int]:
+    """Optimal k-means labels for 1-D ``values``, in O(k * d^2) for d
+    distinct values.
+
+    Returns one label per input value (input order preserved). Labels are
+    0..k-1 ordered by cluster level. Equal values always share a label, so
+    ``k`` is capped at the number of distinct values.
+    """
+    if len(values) == 0:
+        return []
+
+    # Cluster the distinct values, weighted by how often each occurs.
+    counts = {}
+    for value in values:
+        x = float(value)
+        counts[x] = counts.get(x, 0) + 1
+    xs = sorted(counts)
+    n = len(xs)
+    k = max(1, min(k, n))
+
+    prefix_w = [0]
+    prefix = [0.0]
+    prefix_sq = [0.0]
+    for x in xs:
+        w = counts[x]
+        prefix_w.append(prefix_w[-1] + w)
+        prefix.append(prefix[-1] + w * x)
+        prefix_sq.append(prefix_sq[-1] + w * x * x)
+
+    # cost[m][i]: best cost of splitting xs[0..i] into m + 1 clusters;
+    # split[m][i]: start index of the last of those clusters.
+    cost = [[0.0] * n for _ in range(k)]
+    split = [[0] * n for _ in range(k)]
+    for i in range(n):
+        cost[0][i] = _segment_cost(prefix_w, prefix, prefix_sq, 0, i)
+
+    for m in range(1, k):
+        for i in range(m, n):
+            best_cost = None
+            best_start = m
+            for start in range(m, i + 1):
+                candidate = cost[m - 1][start - 1] + _segment_cost(prefix_w, prefix, prefix_sq, start, i)
+                if best_cost is None or candidate < best_cost:
+                    best_cost = candidate
+                    best_start = start
+            cost[m][i] = best_cost
+            split[m][i] = best_start
+
+    label_of = {}
+    end = n - 1
+    for m in range(k - 1, -1, -1):
+        start = split[m][end] if m > 0 else 0
+        for i in range(start, end + 1):
+            label_of[xs[i]] = m
+        end = start - 1
+
+    return [label_of[float(value)] for value in values]
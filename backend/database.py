@@ -0,0 +1,60 @@
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MongoDatabase:
+    """Single pooled Mongo client shared by every router in the process."""
+
+    def __init__(self, url: str, name: str, max_pool_size: int = 100, min_pool_size: int = 0,
+                 max_idle_time_ms: int = 60000, server_selection_timeout_ms: int = 5000):
+        self.url = url
+        self.name = name
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.max_idle_time_ms = max_idle_time_ms
+        self.server_selection_timeout_ms = server_selection_timeout_ms
+        self.client = None
+        self.db = None
+
+    @classmethod
+    def from_env(cls) -> "MongoDatabase":
+        return cls(
+            url=os.environ['MONGO_URL'],
+            name=os.environ['DB_NAME'],
+            max_pool_size=int(os.environ.get('MONGO_MAX_POOL_SIZE', 100)),
+            min_pool_size=int(os.environ.get('MONGO_MIN_POOL_SIZE', 0)),
+            max_idle_time_ms=int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', 60000)),
+            server_selection_timeout_ms=int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+        )
+
+    async def connect(self, warm_up: bool = True):
+        self.client = AsyncIOMotorClient(
+            self.url,
+            maxPoolSize=self.max_pool_size,
+            minPoolSize=self.min_pool_size,
+            maxIdleTimeMS=self.max_idle_time_ms,
+            serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+            # Return stored dates as aware UTC datetimes so they serialize
+            # with an offset.
+            tz_aware=True,
+        )
+        self.db = self.client[self.name]
+        if warm_up:
+            # Fail fast on a bad MONGO_URL and open the first pooled connection
+            # before the worker starts accepting requests.
+            await self.client.admin.command('ping')
+            logger.info(f"Connected to MongoDB database '{self.name}' (maxPoolSize={self.max_pool_size})")
+        return self.db
+
+    def close(self):
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+            self.db = None
+
+async def get_db(request: Request):
+    """FastAPI dependency returning the database opened by the app lifespan"""
+    return request.app.state.mongo.db
@@ -0,0 +1,61 @@
+from pymongo import UpdateOne
+from dates import as_utc
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Fields that older releases stored as ISO strings and are now written as
+# native BSON dates.
+DATE_FIELDS = {
+    "users": ("created_at",),
+    "credit_cards": ("created_at", "expiry_date"),
+    "transactions": ("date",),
+    "card_applications": ("applied_at",),
+}
+
+async def migrate_collection(db, collection: str, field: str, batch_size: int = 500, pause: float = 0.1,
+                             dry_run: bool = False):
+    """Convert string values of ``field`` to dates, ``batch_size`` documents
+    per bulk write with ``pause`` seconds between batches. Yields a
+    progress dict after every batch.
+
+    Converted documents no longer match the string filter, so an
+    interrupted run simply picks up where it stopped. Each update is
+    conditioned on the old value, so a concurrent write is never clobbered.
+    Unparseable values are logged and left as they are.
+    """
+    coll = db[collection]
+    selector = {field: {"$type": "string"}}
+    total = await coll.count_documents(selector)
+    progress = {"collection": collection, "field": field, "total": total, "converted": 0, "skipped": 0}
+    last_id = None
+    
+    while True:
+        query = dict(selector)
+        if last_id is not None:
+            query['_id'] = {"$gt": last_id}
+        batch = await coll.find(query, {field: 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+        
+        ops = []
+        for doc in batch:
+            try:
+                value = as_utc(doc[field])
+            except ValueError:
+                logger.warning(f"{collection} {doc['_id']}: cannot parse {field}={doc[field]!r}, left as is")
+                progress['skipped'] += 1
+                continue
+            ops.append(UpdateOne({"_id": doc['_id'], field: doc[field]}, {"$set": {field: value}}))
+        
+        if ops and not dry_run:
+            result = await coll.bulk_write(ops, ordered=False)
+            progress['converted'] += result.modified_count
+        else:
+            progress['converted'] += len(ops)
+        yield progress
+        
+        if pause:
+            await asyncio.sleep(pause)
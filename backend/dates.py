@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+
+def as_utc(value) -> datetime:
+    """Aware UTC datetime from a datetime (naive ones are taken as UTC) or
+    from an ISO string, as releases before `manage.py migrate-dates` stored.
+    Raises ValueError for an unparseable string."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
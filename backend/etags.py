@@ -0,0 +1,70 @@
+from fastapi import Depends, HTTPException, Request, Response
+from datetime import datetime, timezone
+from routes.auth import get_current_user
+from database import get_db
+from serialization import gzip_etag
+import hashlib
+import json
+import versions
+
+# Part of every versioned ETag; bump it when a response shape changes so
+# clients drop representations cached from an older release.
+ETAG_EPOCH = 1
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match already names ``etag`` (weak comparison, as
+    RFC 9110 prescribes for If-None-Match)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+def json_body_response(request: Request, body: bytes, etag: str) -> Response:
+    """Serve pre-serialized JSON, or 304 if the client has this version"""
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+def versioned_etag(user_id: str, resources: tuple, current: dict, *extra) -> str:
+    payload = [ETAG_EPOCH, user_id, [current.get(resource, 0) for resource in resources], *extra]
+    return '"' + hashlib.sha256(json.dumps(payload).encode()).hexdigest()[:24] + '"'
+
+def conditional_get(*resources: str, refreshed_at=None):
+    """Route dependency for per-user reads that depend only on the given
+    data_versions counters. Answers a matching If-None-Match with 304 after
+    a single data_versions read, before the endpoint queries anything;
+    otherwise sets ETag on the response and leaves the versions it read on
+    request.state.data_versions for the endpoint.
+
+    ``refreshed_at`` is for responses that also change when a scheduled
+    job runs (days until expiry): an async function of db returning when
+    the job last finished, which becomes part of the ETag. Until the job
+    has run at all, the ETag changes every UTC hour instead.
+    """
+    async def check(
+        request: Request,
+        response: Response,
+        current_user: dict = Depends(get_current_user),
+        db=Depends(get_db),
+    ):
+        current = request.state.data_versions = await versions.get_versions(db, current_user['id'])
+        extra = ()
+        if refreshed_at is not None:
+            stamp = await refreshed_at(db)
+            extra = (stamp.isoformat() if stamp else datetime.now(timezone.utc).strftime('%Y-%m-%dT%H'),)
+        etag = versioned_etag(current_user['id'], resources, current, *extra)
+        # json_response may have sent the gzip variant of this representation.
+        for candidate in (etag, gzip_etag(etag)):
+            if etag_matches(request, candidate):
+                raise HTTPException(status_code=304, headers={"ETag": candidate, "Vary": "Accept-Encoding"})
+        response.headers["ETag"] = etag
+        # Let browsers store the response but revalidate it on every use.
+        response.headers["Cache-Control"] = "private, no-cache"
+    
+    return check
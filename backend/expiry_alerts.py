@@ -0,0 +1,125 @@
+from pymongo import ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta, timezone
+from ml_service import MLService
+import asyncio
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# points_expiry_alerts holds one precomputed document per card that has an
+# expiry date:
+#   card_id, user_id, card_name, expiry_date, days_until_expiry,
+#   risk_level, message, computed_at
+# The scheduler recomputes every document each interval, so the days and
+# risk buckets are at most one interval old; card writes refresh their own
+# document straight away. Points balances change with every transaction, so
+# they are not copied here: with_balances() reads them from credit_cards
+# with one $in query on the alerts a request returns.
+
+EXPIRY_ALERTS_SCHEDULER = os.environ.get('EXPIRY_ALERTS_SCHEDULER', 'true').lower() == 'true'
+EXPIRY_ALERTS_INTERVAL_SECONDS = float(os.environ.get('EXPIRY_ALERTS_INTERVAL_SECONDS', 3600))
+EXPIRY_ALERTS_BATCH_SIZE = int(os.environ.get('EXPIRY_ALERTS_BATCH_SIZE', 500))
+
+JOB_NAME = "expiry_alerts"
+CARD_FIELDS = {"_id": 0, "id": 1, "user_id": 1, "bank_name": 1, "card_name": 1, "expiry_date": 1}
+
+ml_service = MLService()
+
+def build_alert(card: dict, now: datetime) -> dict:
+    risk = ml_service.predict_expiry_risk(card, now)
+    return {
+        "card_id": card['id'],
+        "user_id": card['user_id'],
+        "card_name": f"{card['bank_name']} {card['card_name']}",
+        "expiry_date": card['expiry_date'],
+        "days_until_expiry": risk['days'],
+        "risk_level": risk['risk'],
+        "message": risk['message'],
+        "computed_at": now,
+    }
+
+def _upsert_op(card: dict, now: datetime) -> ReplaceOne:
+    return ReplaceOne({"card_id": card['id']}, build_alert(card, now), upsert=True)
+
+async def refresh_card(db, card_id: str):
+    """Recompute one card's alert after the card was written; drops the
+    alert if the card is gone or no longer has an expiry date."""
+    card = await db.credit_cards.find_one({"id": card_id}, CARD_FIELDS)
+    if not card or not isinstance(card.get('expiry_date'), datetime):
+        await db.points_expiry_alerts.delete_one({"card_id": card_id})
+        return
+    await db.points_expiry_alerts.bulk_write([_upsert_op(card, datetime.now(timezone.utc))])
+
+async def with_balances(db, alerts: list) -> list:
+    """Set each alert's current points_balance from its card"""
+    if not alerts:
+        return alerts
+    balances = {
+        card['id']: card.get('points_balance', 0)
+        async for card in db.credit_cards.find(
+            {"id": {"$in": [alert['card_id'] for alert in alerts]}}, {"_id": 0, "id": 1, "points_balance": 1}
+        )
+    }
+    for alert in alerts:
+        alert['points_balance'] = balances.get(alert['card_id'], 0)
+    return alerts
+
+async def refresh_all(db, batch_size: int = EXPIRY_ALERTS_BATCH_SIZE) -> int:
+    """Recompute the alert of every card with an expiry date, then drop
+    alerts that this run did not touch (card deleted or date cleared).
+    Returns the number of alerts written."""
+    now = datetime.now(timezone.utc)
+    written = 0
+    ops = []
+    cursor = db.credit_cards.find({"expiry_date": {"$type": "date"}}, CARD_FIELDS).batch_size(batch_size)
+    async for card in cursor:
+        ops.append(_upsert_op(card, now))
+        if len(ops) >= batch_size:
+            await db.points_expiry_alerts.bulk_write(ops, ordered=False)
+            written += len(ops)
+            ops = []
+    if ops:
+        await db.points_expiry_alerts.bulk_write(ops, ordered=False)
+        written += len(ops)
+
+    await db.points_expiry_alerts.delete_many({"computed_at": {"$lt": now}})
+    await db.job_runs.update_one({"_id": JOB_NAME}, {"$set": {"finished_at": now}}, upsert=True)
+    return written
+
+async def last_refreshed(db):
+    """When refresh_all last completed (the computed_at it wrote), or None"""
+    doc = await db.job_runs.find_one({"_id": JOB_NAME}, {"finished_at": 1})
+    return doc['finished_at'] if doc else None
+
+async def _acquire_lease(db, holder: str, seconds: float) -> bool:
+    """With several API workers only the lease holder runs a refresh; the
+    lease lapses by itself if that worker dies."""
+    now = datetime.now(timezone.utc)
+    try:
+        lease = await db.scheduler_leases.find_one_and_update(
+            {"_id": JOB_NAME, "$or": [{"holder": holder}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"holder": holder, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Another worker holds an unexpired lease.
+        return False
+    return lease['holder'] == holder
+
+async def run_scheduler(db, interval: float = EXPIRY_ALERTS_INTERVAL_SECONDS):
+    """Refresh every alert each ``interval`` seconds until cancelled"""
+    holder = str(uuid.uuid4())
+    while True:
+        try:
+            if await _acquire_lease(db, holder, interval * 2):
+                written = await refresh_all(db)
+                logger.info(f"Refreshed {written} points-expiry alerts")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Points-expiry alert refresh failed: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,159 @@
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Declared index spec for every collection the API queries. Keep this in sync
+# with the filters and sorts used in routes/ - check_indexes() reports drift.
+INDEX_SPEC = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "credit_cards": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("id", ASCENDING)], name="user_id_id"),
+        # The expiry-alert scheduler scans only cards that have a date.
+        IndexModel([("expiry_date", ASCENDING)], name="expiry_date",
+                   partialFilterExpression={"expiry_date": {"$type": "date"}}),
+    ],
+    "transactions": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination in get_transactions sorts on (date, id); each
+        # listing filter gets its own equality prefix in front of that sort.
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)], name="user_id_date_id"),
+        IndexModel([("user_id", ASCENDING), ("card_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+                   name="user_id_card_id_date_id"),
+        IndexModel([("user_id", ASCENDING), ("category", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+                   name="user_id_category_date_id"),
+        IndexModel([("user_id", ASCENDING), ("merchant_key", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)],
+                   name="user_id_merchant_key_date_id"),
+    ],
+    # Partial unique indexes keep concurrent $inc upserts from creating
+    # duplicate rollup documents; the user_id prefix serves the reads.
+    "spending_rollups": [
+        IndexModel([("user_id", ASCENDING), ("kind", ASCENDING), ("category", ASCENDING), ("month", ASCENDING)],
+                   name="user_category_month", unique=True,
+                   partialFilterExpression={"kind": "category_month"}),
+        IndexModel([("user_id", ASCENDING), ("kind", ASCENDING), ("merchant_key", ASCENDING)],
+                   name="user_merchant_key", unique=True,
+                   # Rollups written before merchant_key existed lack it until rebuilt.
+                   partialFilterExpression={"kind": "merchant", "merchant_key": {"$exists": True}}),
+        IndexModel([("user_id", ASCENDING), ("kind", ASCENDING), ("card_id", ASCENDING)],
+                   name="user_card", unique=True, partialFilterExpression={"kind": "card"}),
+    ],
+    "recurring_merchants": [
+        IndexModel([("user_id", ASCENDING), ("merchant_key", ASCENDING)], name="user_merchant_key_unique", unique=True,
+                   partialFilterExpression={"merchant_key": {"$exists": True}}),
+    ],
+    "points_expiry_alerts": [
+        IndexModel([("card_id", ASCENDING)], name="card_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("days_until_expiry", ASCENDING)], name="user_id_days_until_expiry"),
+    ],
+    "data_versions": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "card_rankings": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "llm_responses": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "recommendation_explanations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Explanations are only polled right after the recommendation.
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=86400),
+    ],
+    "card_applications": [
+        IndexModel([("user_id", ASCENDING), ("applied_at", DESCENDING)], name="user_id_applied_at"),
+        IndexModel([("card_id", ASCENDING)], name="card_id"),
+    ],
+}
+
+# Indexes replaced in INDEX_SPEC, dropped by ensure_indexes. Unique ones
+# must go before the new write paths run or they reject valid documents.
+OBSOLETE_INDEXES = {
+    # Grouping moved from the raw merchant string to merchant_key.
+    "transactions": ["user_id_merchant_date_id"],
+    "spending_rollups": ["user_merchant"],
+    "recurring_merchants": ["user_merchant_unique"],
+}
+
+INDEX_NOT_FOUND = 27
+
+def _key_of(keys) -> tuple:
+    return tuple((field, int(direction) if isinstance(direction, (int, float)) else direction)
+                 for field, direction in keys.items())
+
+async def ensure_indexes(db) -> dict:
+    """Drop obsolete indexes and create every declared one. Existing
+    identical indexes are a no-op."""
+    for collection, names in OBSOLETE_INDEXES.items():
+        async for index in db[collection].list_indexes():
+            if index['name'] in names:
+                try:
+                    await db[collection].drop_index(index['name'])
+                except OperationFailure as e:
+                    # Another worker starting up dropped it first.
+                    if e.code != INDEX_NOT_FOUND:
+                        raise
+                    continue
+                logger.info(f"Dropped obsolete index {collection}.{index['name']}")
+    
+    created = {}
+    for collection, models in INDEX_SPEC.items():
+        created[collection] = await db[collection].create_indexes(models)
+        logger.info(f"Ensured indexes on {collection}: {', '.join(created[collection])}")
+    return created
+
+# Index options that change behaviour, and so count as drift when they differ.
+CHECKED_OPTIONS = ("unique", "partialFilterExpression", "expireAfterSeconds")
+
+def _plain(value):
+    """SON/BSON values from list_indexes as plain, comparable Python values"""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+def _options_of(index: dict) -> dict:
+    options = {option: _plain(index[option]) for option in CHECKED_OPTIONS if option in index}
+    if not options.get("unique"):
+        # unique: False is the default; treat it as absent.
+        options.pop("unique", None)
+    return options
+
+async def check_indexes(db) -> dict:
+    """Compare the live indexes with INDEX_SPEC.
+
+    Returns {collection: {"missing": [...], "extra": [...], "mismatched":
+    [...]}} for every collection that has drifted; an empty dict means the
+    database matches. An index is mismatched when its keys match but one of
+    CHECKED_OPTIONS differs.
+    """
+    report = {}
+    for collection, models in INDEX_SPEC.items():
+        declared = {_key_of(dict(m.document['key'])): m.document for m in models}
+
+        live = {}
+        async for index in db[collection].list_indexes():
+            if index['name'] == '_id_':
+                continue
+            live[_key_of(dict(index['key']))] = index
+
+        missing = [doc['name'] for key, doc in declared.items() if key not in live]
+        extra = [index['name'] for key, index in live.items() if key not in declared]
+        mismatched = []
+        for key, doc in declared.items():
+            if key not in live:
+                continue
+            want, have = _options_of(doc), _options_of(live[key])
+            if want != have:
+                mismatched.append({"name": doc['name'], "declared": want, "live": have})
+        if missing or extra or mismatched:
+            report[collection] = {"missing": missing, "extra": extra, "mismatched": mismatched}
+    return report
@@ -0,0 +1,114 @@
+from cache import TTLCache, CACHES
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import logging
+import math
+import os
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_SIZE = int(os.environ.get('LLM_CACHE_SIZE', 2000))
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', 86400))
+# Amounts within the same geometric bucket (25% wide by default) share a
+# cached answer; the advice does not change between ₹400 and ₹480.
+LLM_CACHE_AMOUNT_BUCKET_RATIO = float(os.environ.get('LLM_CACHE_AMOUNT_BUCKET_RATIO', 1.25))
+
+# Bump a template's version whenever its prompt or system message changes,
+# so answers generated from the old wording stop matching.
+TEMPLATE_VERSIONS = {
+    "card-recommendation": 1,
+    "spending-insights": 1,
+}
+
+def amount_bucket(amount: float) -> int:
+    if amount <= 0:
+        return -1
+    return int(math.floor(math.log(amount) / math.log(LLM_CACHE_AMOUNT_BUCKET_RATIO)))
+
+def card_set_hash(cards: list) -> str:
+    """Stable hash of everything about a user's cards that appears in a prompt"""
+    canonical = sorted(
+        (c['id'], c['bank_name'], c['card_name'], c['reward_rate'], sorted(c.get('categories', [])))
+        for c in cards
+    )
+    return hashlib.sha256(json.dumps(canonical).encode()).hexdigest()[:16]
+
+def fingerprint(template: str, **parts) -> str:
+    payload = {"template": template, "version": TEMPLATE_VERSIONS[template], **parts}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+class LLMResponseCache:
+    """Two-tier cache of LLM responses: an in-process LRU in front of the
+    llm_responses collection (expired by a TTL index on expires_at)."""
+
+    def __init__(self, name: str = "llm_responses", maxsize: int = LLM_CACHE_SIZE, ttl: int = LLM_CACHE_TTL_SECONDS):
+        self.name = name
+        self.ttl = ttl
+        self.memory = TTLCache(name, maxsize=maxsize, ttl=ttl, register=False)
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.latency_saved_ms = 0.0
+        CACHES[name] = self
+
+    async def get(self, db, key: str):
+        entry = self.memory.get(key)
+        if entry is not None:
+            self.memory_hits += 1
+            self.latency_saved_ms += entry['latency_ms']
+            return entry['text']
+
+        if db is not None:
+            try:
+                doc = await db.llm_responses.find_one(
+                    {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                    {"text": 1, "latency_ms": 1},
+                )
+            except Exception as e:
+                # The persistent tier is an optimisation; never fail the request over it.
+                logger.warning(f"LLM cache read failed: {e}")
+                doc = None
+            if doc:
+                self.mongo_hits += 1
+                self.latency_saved_ms += doc.get('latency_ms', 0)
+                self.memory.set(key, {"text": doc['text'], "latency_ms": doc.get('latency_ms', 0)})
+                return doc['text']
+
+        self.misses += 1
+        return None
+
+    async def set(self, db, key: str, template: str, text: str, latency_ms: float):
+        self.memory.set(key, {"text": text, "latency_ms": latency_ms})
+        if db is not None:
+            now = datetime.now(timezone.utc)
+            try:
+                await db.llm_responses.update_one(
+                    {"_id": key},
+                    {"$set": {
+                        "template": template,
+                        "template_version": TEMPLATE_VERSIONS[template],
+                        "text": text,
+                        "latency_ms": latency_ms,
+                        "created_at": now,
+                        "expires_at": now + timedelta(seconds=self.ttl),
+                    }},
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"LLM cache write failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.mongo_hits + self.misses
+        return {
+            "size": len(self.memory),
+            "maxsize": self.memory.maxsize,
+            "ttl_seconds": self.ttl,
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.memory_hits + self.mongo_hits) / lookups, 4) if lookups else 0.0,
+            "latency_saved_ms": round(self.latency_saved_ms, 1),
+        }
+
+llm_response_cache = LLMResponseCache()
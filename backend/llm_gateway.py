@@ -0,0 +1,230 @@
+from functools import lru_cache
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDER = os.environ.get('LLM_PROVIDER', 'openai')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'gpt-5.2')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 20))
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get('LLM_BREAKER_RESET_SECONDS', 30))
+
+@lru_cache(maxsize=None)
+def load_llm_chat():
+    """Import emergentintegrations on first use. It pulls in litellm, openai
+    and several provider SDKs, which dominate backend import time."""
+    from emergentintegrations.llm import chat
+    return chat
+
+def warm_up():
+    """Preload the LLM client libraries; run off the event loop at startup"""
+    try:
+        load_llm_chat()
+    except Exception as e:
+        logger.warning(f"LLM warm-up failed: {e}")
+
+class CircuitOpenError(Exception):
+    pass
+
+class CircuitBreaker:
+    """Opens after ``failure_threshold`` consecutive failures. While open,
+    calls fail immediately; after ``reset_seconds`` one trial call is let
+    through (half-open) and its outcome closes or re-opens the circuit."""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self.trial_in_flight):
+            raise CircuitOpenError("LLM circuit breaker is open")
+        if state == "half_open":
+            self.trial_in_flight = True
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.opened_at is not None or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+class LLMGateway:
+    """Single entry point for every LLM call in the process.
+
+    - a semaphore caps concurrent provider calls,
+    - identical in-flight prompts share one provider call (single flight),
+    - each call has a deadline covering both queueing and the request,
+    - a circuit breaker fails fast after repeated errors so callers drop
+      straight to their rule-based fallbacks.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT_SECONDS,
+                 failure_threshold: int = LLM_BREAKER_FAILURES, reset_seconds: float = LLM_BREAKER_RESET_SECONDS):
+        self.api_key = os.environ.get('EMERGENT_LLM_KEY')
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(failure_threshold, reset_seconds)
+        self._semaphore = None
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def _new_chat(self, session_id: str, system_message: str):
+        # LlmChat keeps the conversation history of its session, so instances
+        # are per call; the SDK module and its HTTP clients are shared.
+        return load_llm_chat().LlmChat(
+            api_key=self.api_key,
+            session_id=session_id,
+            system_message=system_message
+        ).with_model(LLM_PROVIDER, LLM_MODEL)
+
+    async def _request(self, session_id: str, system_message: str, prompt: str) -> str:
+        async with self.semaphore:
+            chat = self._new_chat(session_id, system_message)
+            return await chat.send_message(load_llm_chat().UserMessage(text=prompt))
+
+    async def _call(self, key, session_id: str, system_message: str, prompt: str) -> str:
+        try:
+            result = await asyncio.wait_for(self._request(session_id, system_message, prompt), self.timeout)
+        except asyncio.CancelledError:
+            # Every caller went away; not the provider's fault.
+            self.breaker.trial_in_flight = False
+            raise
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                self.timeouts += 1
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    async def send(self, session_id: str, system_message: str, prompt: str, key=None) -> str:
+        """Send ``prompt`` and return the response text. ``key`` identifies
+        equivalent prompts for coalescing (defaults to the prompt itself).
+
+        If every caller waiting on a prompt is cancelled (e.g. the client
+        disconnected), the provider call is cancelled too.
+
+        Raises CircuitOpenError, asyncio.TimeoutError or the provider error.
+        """
+        key = key or (session_id, system_message, prompt)
+        flight = self._inflight.get(key)
+        if flight is None:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self.rejected += 1
+                raise
+            task = asyncio.create_task(self._call(key, session_id, system_message, prompt))
+            flight = self._inflight[key] = {"task": task, "waiters": 0}
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        flight['waiters'] += 1
+        try:
+            return await asyncio.shield(flight['task'])
+        finally:
+            flight['waiters'] -= 1
+            if flight['waiters'] == 0 and not flight['task'].done():
+                flight['task'].cancel()
+
+    async def stream(self, session_id: str, system_message: str, prompt: str):
+        """Async generator of response text chunks, under the same
+        concurrency cap, deadline and circuit breaker as send().
+
+        Uses the SDK's stream_message when it has one; otherwise the full
+        response arrives as a single chunk. Streams are never coalesced.
+        Closing the generator (e.g. on client disconnect) cancels the call.
+        """
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+
+        self.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        try:
+            async with asyncio.timeout_at(deadline):
+                await self.semaphore.acquire()
+            try:
+                chat = self._new_chat(session_id, system_message)
+                message = load_llm_chat().UserMessage(text=prompt)
+                if hasattr(chat, "stream_message"):
+                    chunks = chat.stream_message(message).__aiter__()
+                    while True:
+                        try:
+                            async with asyncio.timeout_at(deadline):
+                                chunk = await chunks.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        yield chunk
+                else:
+                    async with asyncio.timeout_at(deadline):
+                        text = await chat.send_message(message)
+                    yield text
+            finally:
+                self.semaphore.release()
+        except (asyncio.CancelledError, GeneratorExit):
+            self.breaker.trial_in_flight = False
+            raise
+        except Exception as e:
+            if isinstance(e, TimeoutError):
+                self.timeouts += 1
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+
+    def stats(self) -> dict:
+        return {
+            "breaker_state": self.breaker.state,
+            "consecutive_failures": self.breaker.consecutive_failures,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._inflight),
+            "timeout_seconds": self.timeout,
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "rejected_by_breaker": self.rejected,
+        }
+
+llm_gateway = LLMGateway()
@@ -1,22 +1,86 @@
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-import os
+import time
+import logging
 from dotenv import load_dotenv
 from pathlib import Path
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+from llm_gateway import llm_gateway
+from llm_cache import llm_response_cache, fingerprint, amount_bucket, card_set_hash
+from card_ranking import best_card as pick_best_card
+
+logger = logging.getLogger(__name__)
+
+EXPERT_SYSTEM_MESSAGE = "You are a credit card rewards optimization expert. Give concise, practical advice."
+ADVISOR_SYSTEM_MESSAGE = "You are a personal finance advisor focused on credit card rewards optimization."
+NO_SPENDING_MESSAGE = "Start using your cards to see personalized insights!"
+
 class LLMService:
     def __init__(self):
-        self.api_key = os.environ.get('EMERGENT_LLM_KEY')
+        self.gateway = llm_gateway
+    
+    async def _complete(self, template: str, key: str, system_message: str, prompt: str, db=None) -> str:
+        """Send one prompt through the gateway, answering from
+        llm_response_cache when possible. Raises on LLM errors, timeouts and
+        an open circuit so callers can fall back."""
+        cached = await llm_response_cache.get(db, key)
+        if cached is not None:
+            return cached
+        
+        started = time.perf_counter()
+        response = await self.gateway.send(template, system_message, prompt, key=key)
+        latency_ms = (time.perf_counter() - started) * 1000
+        
+        await llm_response_cache.set(db, key, template, response, latency_ms)
+        return response
+    
+    async def _stream(self, template: str, key, system_message: str, prompt: str, fallback: str, db=None):
+        """Yield response chunks through the gateway. A cached answer is sent
+        whole; on failure before any output the fallback text is sent, and a
+        complete answer is written to llm_response_cache."""
+        if key is not None:
+            cached = await llm_response_cache.get(db, key)
+            if cached is not None:
+                yield cached
+                return
         
-    async def get_card_recommendation(self, category: str, amount: float, cards: list) -> dict:
+        started = time.perf_counter()
+        parts = []
+        try:
+            async for chunk in self.gateway.stream(template, system_message, prompt):
+                parts.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.warning(f"LLM error: {e}")
+            if not parts:
+                yield fallback
+            return
+        
+        if key is not None:
+            latency_ms = (time.perf_counter() - started) * 1000
+            await llm_response_cache.set(db, key, template, "".join(parts), latency_ms)
+        
+    async def get_card_recommendation(self, category: str, amount: float, cards: list, db=None) -> dict:
         if not cards:
             return {
                 "reason": "No cards available for recommendation",
                 "card_id": None
             }
         
+        best_card = pick_best_card(cards, category)
+        reason, _ = await self.explain_recommendation(category, amount, cards, best_card, db=db)
+        return {
+            "reason": reason,
+            "card_id": best_card['id']
+        }
+    
+    def fallback_reason(self, best_card: dict) -> str:
+        return f"Based on reward rates, use the {best_card['bank_name']} {best_card['card_name']} for maximum points."
+    
+    async def explain_recommendation(self, category: str, amount: float, cards: list, best_card: dict, db=None) -> tuple:
+        """Natural-language reason for a card already chosen by card_ranking.
+        Returns (text, is_fallback)."""
         cards_info = "\n".join([
             f"- {card['bank_name']} {card['card_name']}: {card['reward_rate']}x on {', '.join(card.get('categories', []))} (ID: {card['id']})"
             for card in cards
@@ -32,39 +96,25 @@ Available Cards:
 Provide a brief recommendation (2-3 sentences) explaining which card to use and why. Consider Indian spending patterns. Format: "Use the [Bank] [Card Name] because [reason]."""
         
         try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id="card-recommendation",
-                system_message="You are a credit card rewards optimization expert. Give concise, practical advice."
-            ).with_model("openai", "gpt-5.2")
-            
-            user_message = UserMessage(text=prompt)
-            response = await chat.send_message(user_message)
-            
-            best_card = max(cards, key=lambda c: c['reward_rate'] * (1.5 if category in c.get('categories', []) else 1))
-            
-            return {
-                "reason": response,
-                "card_id": best_card['id']
-            }
+            key = fingerprint(
+                "card-recommendation",
+                category=category.strip().lower(),
+                amount_bucket=amount_bucket(amount),
+                cards=card_set_hash(cards),
+            )
+            return await self._complete(
+                "card-recommendation", key,
+                EXPERT_SYSTEM_MESSAGE,
+                prompt, db=db
+            ), False
         except Exception as e:
-            print(f"LLM error: {e}")
-            best_card = max(cards, key=lambda c: c['reward_rate'])
-            return {
-                "reason": f"Based on reward rates, use the {best_card['bank_name']} {best_card['card_name']} for maximum points.",
-                "card_id": best_card['id']
-            }
+            logger.warning(f"LLM error: {e}")
+            return self.fallback_reason(best_card), True
     
-    async def generate_spending_insights(self, transactions: list, patterns: dict) -> str:
-        if not transactions:
-            return "Start using your cards to see personalized insights!"
-        
-        categories = {}
-        for t in transactions:
-            categories[t['category']] = categories.get(t['category'], 0) + t['amount']
-        
-        top_category = max(categories, key=categories.get) if categories else "general"
-        total_spent = sum(t['amount'] for t in transactions)
+    def _insights_request(self, categories: dict):
+        """Returns (cache key, prompt, fallback text) for spending insights"""
+        top_category = max(categories, key=categories.get)
+        total_spent = sum(categories.values())
         
         prompt = f"""Generate 2-3 actionable insights about this spending pattern in India:
 
@@ -74,24 +124,53 @@ Categories: {', '.join(categories.keys())}
 
 Provide brief, actionable tips for maximizing rewards in the Indian credit card market."""
         
+        key = fingerprint(
+            "spending-insights",
+            top_category=top_category,
+            top_amount_bucket=amount_bucket(categories.get(top_category, 0)),
+            total_bucket=amount_bucket(total_spent),
+            categories=sorted(categories),
+        )
+        fallback = f"You spent most on {top_category}. Consider using cards with higher rewards in this category to maximize points."
+        return key, prompt, fallback
+    
+    async def generate_spending_insights(self, categories: dict, patterns: dict, db=None) -> tuple:
+        """categories maps category name to total amount spent. Returns
+        (text, is_fallback); the rule-based fallback should not be cached."""
+        if not categories:
+            return NO_SPENDING_MESSAGE, False
+        
+        key, prompt, fallback = self._insights_request(categories)
+        try:
+            return await self._complete("spending-insights", key, ADVISOR_SYSTEM_MESSAGE, prompt, db=db), False
+        except Exception as e:
+            logger.warning(f"LLM error: {e}")
+            return fallback, True
+    
+    async def stream_spending_insights(self, categories: dict, patterns: dict, db=None):
+        """Like generate_spending_insights, yielding text as it arrives"""
+        if not categories:
+            yield NO_SPENDING_MESSAGE
+            return
+        
+        key, prompt, fallback = self._insights_request(categories)
+        async for chunk in self._stream("spending-insights", key, ADVISOR_SYSTEM_MESSAGE, prompt, fallback, db=db):
+            yield chunk
+    
+    def _optimizer_request(self, top_merchants: list, total_annual_gain: int):
+        prompt = f"""As a credit card rewards expert in India, provide 2-3 brief tips for maximizing rewards on these recurring bills: {', '.join(top_merchants)}. The user could gain {total_annual_gain} points annually by optimizing. Consider Indian credit card market. Keep it actionable and concise."""
+        fallback = f"By switching to better cards for your recurring bills, you could earn {total_annual_gain} additional points per year!"
+        return prompt, fallback
+    
+    async def generate_optimizer_tips(self, top_merchants: list, total_annual_gain: int) -> str:
+        prompt, fallback = self._optimizer_request(top_merchants, total_annual_gain)
         try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id="spending-insights",
-                system_message="You are a personal finance advisor focused on credit card rewards optimization."
-            ).with_model("openai", "gpt-5.2")
-            
-            user_message = UserMessage(text=prompt)
-            response = await chat.send_message(user_message)
-            return response
+            return await self.gateway.send("optimizer-insights", EXPERT_SYSTEM_MESSAGE, prompt)
         except Exception as e:
-            print(f"LLM error: {e}")
-            return f"You spent most on {top_category}. Consider using cards with higher rewards in this category to maximize points."
+            logger.warning(f"LLM error: {e}")
+            return fallback
     
-    def get_chat_instance(self, session_id: str):
-        """Get a chat instance for the optimizer"""
-        return LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message="You are a credit card rewards optimization expert. Give concise, practical advice."
-        ).with_model("openai", "gpt-5.2")
+    async def stream_optimizer_tips(self, top_merchants: list, total_annual_gain: int):
+        prompt, fallback = self._optimizer_request(top_merchants, total_annual_gain)
+        async for chunk in self._stream("optimizer-insights", None, EXPERT_SYSTEM_MESSAGE, prompt, fallback):
+            yield chunk
@@ -0,0 +1,191 @@
+"""Maintenance commands for the CredMax backend.
+
+Usage:
+    python manage.py ensure-indexes
+    python manage.py check-indexes
+    python manage.py rebuild-rollups [--user-id USER_ID]
+    python manage.py rebuild-recurring [--user-id USER_ID]
+    python manage.py migrate-dates [--collection NAME] [--batch-size 500] [--pause-ms 100] [--dry-run]
+    python manage.py refresh-expiry-alerts
+    python manage.py backfill-merchant-keys [--all] [--batch-size 500] [--pause-ms 100]
+    python manage.py profile-imports [--module server] [--top 25]
+"""
+from dotenv import load_dotenv
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from database import MongoDatabase
+import date_migration
+import expiry_alerts
+import indexes
+import merchants
+import recurring
+import rollups
+
+async def cmd_ensure_indexes(db, args) -> int:
+    created = await indexes.ensure_indexes(db)
+    print(json.dumps(created, indent=2))
+    return 0
+
+async def cmd_check_indexes(db, args) -> int:
+    report = await indexes.check_indexes(db)
+    if not report:
+        print("All declared indexes present with matching options, no extra indexes.")
+        return 0
+    print(json.dumps(report, indent=2))
+    return 1
+
+async def cmd_rebuild_rollups(db, args) -> int:
+    try:
+        if args.user_id:
+            count = await rollups.rebuild_user(db, args.user_id)
+            print(f"Rebuilt rollups for {args.user_id} from {count} transactions")
+        else:
+            results = await rollups.rebuild_all(db)
+            print(f"Rebuilt rollups for {len(results)} users from {sum(results.values())} transactions")
+    except rollups.MerchantKeysMissingError as e:
+        print(f"User {e} has transactions without merchant_key; run backfill-merchant-keys first")
+        return 1
+    return 0
+
+async def cmd_rebuild_recurring(db, args) -> int:
+    if args.user_id:
+        count = await recurring.rebuild_user(db, args.user_id)
+        print(f"Rebuilt recurring merchant state for {args.user_id} from {count} transactions")
+    else:
+        results = await recurring.rebuild_all(db)
+        print(f"Rebuilt recurring merchant state for {len(results)} users from {sum(results.values())} transactions")
+    return 0
+
+async def cmd_migrate_dates(db, args) -> int:
+    """Convert ISO-string dates to BSON dates in place; safe to re-run"""
+    fields = date_migration.DATE_FIELDS
+    if args.collection:
+        fields = {args.collection: fields[args.collection]}
+    for collection, names in fields.items():
+        for field in names:
+            print(f"{collection}.{field}:")
+            progress = None
+            async for progress in date_migration.migrate_collection(
+                db, collection, field, batch_size=args.batch_size, pause=args.pause_ms / 1000, dry_run=args.dry_run
+            ):
+                done = progress['converted'] + progress['skipped']
+                print(f"  {done}/{progress['total']} ({progress['converted']} converted, {progress['skipped']} skipped)")
+            if progress is None:
+                print("  nothing to convert")
+    if not args.dry_run and 'credit_cards' in fields:
+        # Cards with a newly converted expiry_date get their alert now
+        # rather than at the next scheduled refresh.
+        await expiry_alerts.refresh_all(db)
+    return 0
+
+async def cmd_refresh_expiry_alerts(db, args) -> int:
+    """Run one scheduled points-expiry alert refresh now"""
+    written = await expiry_alerts.refresh_all(db)
+    print(f"Refreshed {written} points-expiry alerts")
+    return 0
+
+async def cmd_backfill_merchant_keys(db, args) -> int:
+    """Set transactions.merchant_key, then regroup the rollups and recurring
+    state that are keyed by it"""
+    progress = None
+    async for progress in merchants.backfill_merchant_keys(
+        db, batch_size=args.batch_size, pause=args.pause_ms / 1000, recompute=args.all
+    ):
+        print(f"  {progress['updated']}/{progress['total']} transactions updated")
+    if progress is None:
+        print("All transactions already have a merchant_key")
+    
+    rollup_results = await rollups.rebuild_all(db)
+    recurring_results = await recurring.rebuild_all(db)
+    print(f"Rebuilt rollups and recurring state for {len(rollup_results | recurring_results)} users")
+    return 0
+
+async def cmd_profile_imports(db, args) -> int:
+    """Import a module in a fresh interpreter under -X importtime and list
+    the slowest imports by cumulative time."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {args.module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|", 2))
+        rows.append((int(cumulative_us), int(self_us), name))
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        return result.returncode
+
+    total_us = max((row[0] for row in rows if not row[2].startswith(" ")), default=0)
+    print(f"Importing {args.module}: {total_us / 1000:.1f} ms cumulative")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative_us, self_us, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:9.1f}  {name}")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="CredMax backend maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sub = subparsers.add_parser("ensure-indexes", help="Create every index declared in indexes.INDEX_SPEC")
+    sub.set_defaults(handler=cmd_ensure_indexes)
+
+    sub = subparsers.add_parser("check-indexes", help="Report missing, extra or mismatched indexes (exit 1 on drift)")
+    sub.set_defaults(handler=cmd_check_indexes)
+
+    sub = subparsers.add_parser("rebuild-rollups", help="Backfill spending_rollups from raw transactions")
+    sub.add_argument("--user-id", help="Only rebuild this user's rollups")
+    sub.set_defaults(handler=cmd_rebuild_rollups)
+
+    sub = subparsers.add_parser("rebuild-recurring", help="Backfill recurring_merchants from raw transactions")
+    sub.add_argument("--user-id", help="Only rebuild this user's state")
+    sub.set_defaults(handler=cmd_rebuild_recurring)
+
+    sub = subparsers.add_parser("migrate-dates", help="Convert stored ISO-string dates to native BSON dates")
+    sub.add_argument("--collection", choices=sorted(date_migration.DATE_FIELDS), help="Only migrate this collection")
+    sub.add_argument("--batch-size", type=int, default=500)
+    sub.add_argument("--pause-ms", type=int, default=100, help="Sleep between batches to limit load")
+    sub.add_argument("--dry-run", action="store_true", help="Count and parse, but write nothing")
+    sub.set_defaults(handler=cmd_migrate_dates)
+
+    sub = subparsers.add_parser("refresh-expiry-alerts", help="Recompute points_expiry_alerts for every card")
+    sub.set_defaults(handler=cmd_refresh_expiry_alerts)
+
+    sub = subparsers.add_parser("backfill-merchant-keys", help="Normalise merchants on existing transactions")
+    sub.add_argument("--all", action="store_true", help="Recompute every key, e.g. after MERCHANT_RULES change")
+    sub.add_argument("--batch-size", type=int, default=500)
+    sub.add_argument("--pause-ms", type=int, default=100, help="Sleep between batches to limit load")
+    sub.set_defaults(handler=cmd_backfill_merchant_keys)
+
+    sub = subparsers.add_parser("profile-imports", help="Show the slowest imports when loading the backend")
+    sub.add_argument("--module", default="server")
+    sub.add_argument("--top", type=int, default=25)
+    sub.set_defaults(handler=cmd_profile_imports, needs_db=False)
+
+    return parser
+
+async def run(args) -> int:
+    if not getattr(args, "needs_db", True):
+        return await args.handler(None, args)
+    mongo = MongoDatabase.from_env()
+    db = await mongo.connect()
+    try:
+        return await args.handler(db, args)
+    finally:
+        mongo.close()
+
+def main() -> int:
+    args = build_parser().parse_args()
+    return asyncio.run(run(args))
+
+if __name__ == "__main__":
+    sys.exit(main())
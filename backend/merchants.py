@@ -0,0 +1,118 @@
+from pymongo import UpdateOne
+import asyncio
+import re
+
+# Canonical merchant keys, computed once when a transaction is written and
+# stored as transactions.merchant_key. Rollups, recurring-bill detection
+# and co-brand matching group on the key, so "Swiggy", "SWIGGY*ORDER 1234"
+# and "swiggy " are one merchant.
+#
+# Key -> aliases. An alias matches the merchant's core name (see
+# _core_tokens) with the separators between its tokens removed, so
+# "Big Basket" and "AMZN MKTP" match but "Amazonas Cafe" and "Indigo
+# Paints" do not. Run `manage.py backfill-merchant-keys --all` after
+# changing any of these rules.
+MERCHANT_RULES = {
+    "amazon": ("amazon", "amzn"),
+    "flipkart": ("flipkart", "fkrt"),
+    "myntra": ("myntra",),
+    "swiggy": ("swiggy",),
+    "zomato": ("zomato",),
+    "bigbasket": ("bigbasket",),
+    "uber": ("uber",),
+    "ola": ("olacabs", "ola"),
+    "netflix": ("netflix",),
+    "spotify": ("spotify",),
+    "hotstar": ("hotstar", "disneyhotstar"),
+    "bookmyshow": ("bookmyshow",),
+    "vistara": ("vistara",),
+    "indigo": ("goindigo", "indigo"),
+    "airindia": ("airindia",),
+    "irctc": ("irctc",),
+    "makemytrip": ("makemytrip", "mmt"),
+    "airtel": ("airtel",),
+    "jio": ("reliancejio", "jio"),
+    "paytm": ("paytm",),
+}
+
+# Payment-processor prefixes and filler words that say nothing about who
+# was paid.
+NOISE_TOKENS = {
+    "pos", "upi", "sq", "paypal", "razorpay", "payu", "ccavenue", "billdesk",
+    "order", "orders", "payment", "payments", "txn", "ref", "online", "purchase",
+    "www", "com", "co", "in", "pvt", "ltd", "limited", "private", "the",
+}
+
+# Trailing words that describe a merchant's line of business or outlet
+# rather than naming it: "Starbucks Coffee", "AMZN MKTP", "OLA CABS".
+DESCRIPTOR_TOKENS = {
+    "mktp", "marketplace", "seller", "store", "stores", "outlet", "branch", "shop",
+    "app", "services", "retail", "digital", "internet", "technologies", "tech",
+    "cabs", "cab", "trip", "trips", "ride", "rides", "airlines", "airline", "air",
+    "instamart", "coffee", "cafe", "restaurant", "foods", "food",
+    "prepaid", "postpaid", "recharge", "broadband",
+}
+
+# Statement descriptors often end with the outlet's city.
+LOCATION_TOKENS = {
+    "mumbai", "bombay", "delhi", "new", "bangalore", "bengaluru", "chennai", "madras",
+    "kolkata", "calcutta", "hyderabad", "pune", "gurgaon", "gurugram", "noida",
+    "ahmedabad", "jaipur", "lucknow", "kochi", "cochin", "chandigarh", "indore",
+    "thane", "navi", "goa", "mh", "dl", "ka", "tn", "ind", "india",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ALIASES = {alias: key for key, aliases in MERCHANT_RULES.items() for alias in aliases}
+
+def _generic(token: str) -> bool:
+    return token in LOCATION_TOKENS or token in DESCRIPTOR_TOKENS
+
+def _core_tokens(tokens: list) -> list:
+    """Drop trailing locations and descriptors, unless only generic words
+    would be left ("Air India" stays whole rather than becoming "air")"""
+    core = list(tokens)
+    while len(core) > 1 and _generic(core[-1]) and not all(_generic(token) for token in core[:-1]):
+        core.pop()
+    return core
+
+def normalize_merchant(name: str) -> str:
+    tokens = [
+        token for token in _TOKEN_RE.findall(name.lower())
+        if token not in NOISE_TOKENS and not any(ch.isdigit() for ch in token)
+    ]
+    core = _core_tokens(tokens)
+    key = _ALIASES.get("".join(core))
+    if key:
+        return key
+    if core:
+        return " ".join(core[:3])
+    # Nothing but noise and digits; fall back to the trimmed raw name.
+    return " ".join(name.lower().split())
+
+async def backfill_merchant_keys(db, batch_size: int = 500, pause: float = 0.1, recompute: bool = False):
+    """Set merchant_key on transactions written before it existed (or, with
+    ``recompute``, on all of them after MERCHANT_RULES change). Yields a
+    progress dict after every batch; re-running resumes."""
+    selector = {} if recompute else {"merchant_key": {"$exists": False}}
+    total = await db.transactions.count_documents(selector)
+    progress = {"total": total, "updated": 0}
+    last_id = None
+    
+    while True:
+        query = dict(selector)
+        if last_id is not None:
+            query['_id'] = {"$gt": last_id}
+        batch = await db.transactions.find(query, {"merchant": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]['_id']
+        
+        result = await db.transactions.bulk_write([
+            UpdateOne({"_id": doc['_id']}, {"$set": {"merchant_key": normalize_merchant(doc['merchant'])}})
+            for doc in batch
+        ], ordered=False)
+        progress['updated'] += result.modified_count
+        yield progress
+        
+        if pause:
+            await asyncio.sleep(pause)
@@ -1,31 +1,24 @@
-from sklearn.cluster import KMeans
-import numpy as np
-from collections import defaultdict
+from clustering import ckmeans
+from datetime import datetime, timezone
 
 class MLService:
-    def analyze_spending_patterns(self, transactions: list) -> dict:
-        if len(transactions) < 3:
+    def analyze_spending_summary(self, transaction_count: int, category_spending: dict, monthly_spending: dict) -> dict:
+        """Spending-level clusters and monthly averages from precomputed
+        category and month totals (see rollups.load_spending_summary)"""
+        if transaction_count < 3:
             return {
                 "clusters": [],
                 "monthly_avg": {},
                 "trends": "Not enough data for analysis"
             }
         
-        category_spending = defaultdict(float)
-        monthly_spending = defaultdict(float)
-        
-        for t in transactions:
-            category_spending[t['category']] += t['amount']
-            month_key = t['date'][:7] if isinstance(t['date'], str) else t['date'].strftime('%Y-%m')
-            monthly_spending[month_key] += t['amount']
-        
         if len(category_spending) >= 2:
             categories = list(category_spending.keys())
-            amounts = np.array(list(category_spending.values())).reshape(-1, 1)
             
-            n_clusters = min(3, len(categories))
-            kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-            labels = kmeans.fit_predict(amounts)
+            # Exact 1-D clustering; labels come back ordered Low -> High,
+            # with fewer levels when categories tie.
+            labels = ckmeans([category_spending[cat] for cat in categories], 3)
+            n_clusters = max(labels) + 1
             
             clusters = []
             for i in range(n_clusters):
@@ -54,21 +47,16 @@ class MLService:
             "category_totals": {k: round(v, 2) for k, v in category_spending.items()}
         }
     
-    def predict_expiry_risk(self, card: dict, transactions: list) -> dict:
+    def predict_expiry_risk(self, card: dict, now: datetime = None) -> dict:
         if not card.get('expiry_date'):
             return {"risk": "low", "message": "No expiry date set"}
         
-        from datetime import datetime
-        try:
-            expiry = datetime.fromisoformat(card['expiry_date'].replace('Z', '+00:00'))
-            now = datetime.now()
-            days_until_expiry = (expiry - now).days
-            
-            if days_until_expiry < 30:
-                return {"risk": "high", "message": f"Points expire in {days_until_expiry} days!", "days": days_until_expiry}
-            elif days_until_expiry < 90:
-                return {"risk": "medium", "message": f"Points expire in {days_until_expiry} days", "days": days_until_expiry}
-            else:
-                return {"risk": "low", "message": f"Points expire in {days_until_expiry} days", "days": days_until_expiry}
-        except:
-            return {"risk": "unknown", "message": "Unable to parse expiry date"}
+        now = now or datetime.now(timezone.utc)
+        days_until_expiry = (card['expiry_date'] - now).days
+        
+        if days_until_expiry < 30:
+            return {"risk": "high", "message": f"Points expire in {days_until_expiry} days!", "days": days_until_expiry}
+        elif days_until_expiry < 90:
+            return {"risk": "medium", "message": f"Points expire in {days_until_expiry} days", "days": days_until_expiry}
+        else:
+            return {"risk": "low", "message": f"Points expire in {days_until_expiry} days", "days": days_until_expiry}
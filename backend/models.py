@@ -38,7 +38,7 @@ class CreditCard(BaseModel):
     reward_type: str
     reward_rate: float
     points_balance: int = 0
-    expiry_date: Optional[str] = None
+    expiry_date: Optional[datetime] = None
     categories: List[str] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
@@ -48,7 +48,7 @@ class CreditCardCreate(BaseModel):
     last_four: Optional[str] = None
     reward_type: str
     reward_rate: float
-    expiry_date: Optional[str] = None
+    expiry_date: Optional[datetime] = None
     categories: List[str] = []
 
 class CreditCardResponse(BaseModel):
@@ -60,7 +60,7 @@ class CreditCardResponse(BaseModel):
     reward_type: str
     reward_rate: float
     points_balance: int
-    expiry_date: Optional[str] = None
+    expiry_date: Optional[datetime] = None
     categories: List[str]
     created_at: datetime
 
@@ -83,6 +83,9 @@ class TransactionCreate(BaseModel):
     merchant: str
     points_earned: int
 
+class TransactionImportRow(TransactionCreate):
+    date: Optional[datetime] = None
+
 class TransactionResponse(BaseModel):
     id: str
     user_id: str
@@ -104,3 +107,5 @@ class RecommendationResponse(BaseModel):
     reason: str
     points_earned: int
     reward_rate: float
+    explanation_id: Optional[str] = None
+    explanation_status: Optional[str] = None
@@ -0,0 +1,79 @@
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timezone
+from card_ranking import effective_rate
+import versions
+import logging
+
+logger = logging.getLogger(__name__)
+
+# card_rankings holds one compiled lookup per user, rebuilt whenever a card
+# is created, updated or deleted:
+#   {"user_id", "cards_version", "built_at",
+#    "cards":       [card summary, ...]            (listing order)
+#    "by_category": [{"category", "ranking"}, ...] (each bonus category)
+#    "default":     ranking                        (every other category)}
+# A ranking is [{"card_id", "card_index", "effective_rate"}, ...], best
+# first, ties in listing order - the order card_ranking.best_card picks
+# from; card_index points into "cards". Categories are stored as a list
+# because they are free text and may contain "." or "$"; load() turns them
+# into a dict.
+
+CARD_FIELDS = ("id", "bank_name", "card_name", "reward_rate", "categories")
+
+def _ranking(cards: list, category) -> list:
+    ranked = sorted(range(len(cards)), key=lambda i: -effective_rate(cards[i], category))
+    return [
+        {"card_id": cards[i]['id'], "card_index": i, "effective_rate": effective_rate(cards[i], category)}
+        for i in ranked
+    ]
+
+def build_table(cards: list) -> dict:
+    summaries = [{field: card.get(field, [] if field == "categories" else None) for field in CARD_FIELDS}
+                 for card in cards]
+    categories = sorted({category for card in summaries for category in card['categories']})
+    return {
+        "cards": summaries,
+        "by_category": [{"category": category, "ranking": _ranking(summaries, category)} for category in categories],
+        # No card has a bonus on a category outside the list, so base rates decide.
+        "default": _ranking(summaries, None),
+    }
+
+async def rebuild(db, user_id: str) -> dict:
+    """Compile the user's table from credit_cards and store it. The cards
+    version is read before the cards, and a write never replaces a table
+    built from a newer version, so concurrent rebuilds settle on the latest."""
+    cards_version = (await versions.get_versions(db, user_id)).get(versions.CARDS, 0)
+    cards = await db.credit_cards.find({"user_id": user_id}, {"_id": 0}).to_list(100)
+    
+    doc = {
+        "user_id": user_id,
+        "cards_version": cards_version,
+        "built_at": datetime.now(timezone.utc),
+        **build_table(cards),
+    }
+    try:
+        await db.card_rankings.replace_one(
+            {"user_id": user_id, "cards_version": {"$lte": cards_version}}, doc, upsert=True
+        )
+    except DuplicateKeyError:
+        # A rebuild from a newer version already landed.
+        logger.debug(f"Skipped stale card ranking rebuild for {user_id}")
+    return doc
+
+async def load(db, user_id: str) -> dict:
+    """The user's table with by_category as a dict; built on first use for
+    users whose cards predate it. This is also the exported form."""
+    doc = await db.card_rankings.find_one({"user_id": user_id}, {"_id": 0})
+    if doc is None:
+        doc = await rebuild(db, user_id)
+        doc.pop('_id', None)
+    doc['by_category'] = {entry['category']: entry['ranking'] for entry in doc['by_category']}
+    return doc
+
+def best_card(table: dict, category: str):
+    """Summary of the top-ranked card for the category from a loaded table,
+    or None when the user has no cards"""
+    ranking = table['by_category'].get(category, table['default'])
+    if not ranking:
+        return None
+    return table['cards'][ranking[0]['card_index']]
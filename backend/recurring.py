@@ -0,0 +1,189 @@
+from pymongo import UpdateOne
+from merchants import normalize_merchant
+from dates import as_utc
+from datetime import datetime, timedelta, timezone
+import math
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# recurring_merchants keeps one running-statistics document per
+# (user, merchant_key), folded forward on every transaction write:
+#   merchant (first name seen), category, first_date, last_date,
+#   last_amount, card_id (of the latest payment),
+#   amount_count/sum/sumsq and interval_count/sum/sumsq, where an
+#   interval is the gap in days between consecutive payments.
+# Updating it is O(1) per transaction; classify() turns it into a cadence
+# (weekly / monthly / annual) with a confidence score.
+#
+# A payment dated before the merchant's last_date (a backfill) still counts
+# towards the amounts and towards intervals within its own batch, but no
+# gap to the stored history is recorded for it. `manage.py rebuild-recurring`
+# recomputes the exact state from history.
+
+DAY_MS = 86400000
+
+# Nominal period in days and payments per year.
+PERIODS = {
+    "weekly": (7, 52),
+    "monthly": (30.44, 12),
+    "annual": (365.25, 1),
+}
+# The mean interval must fall within this fraction of a nominal period.
+RECURRING_PERIOD_TOLERANCE = float(os.environ.get('RECURRING_PERIOD_TOLERANCE', 0.25))
+RECURRING_MIN_CONFIDENCE = float(os.environ.get('RECURRING_MIN_CONFIDENCE', 0.5))
+
+def _fold(transactions: list) -> dict:
+    """Summarise a batch per merchant, in date order"""
+    by_merchant = {}
+    # Rebuilds may read string dates that migrate-dates has not converted yet.
+    for date, t in sorted(((as_utc(t['date']), t) for t in transactions), key=lambda pair: pair[0]):
+        s = by_merchant.get(t['merchant_key'])
+        if s is None:
+            s = by_merchant[t['merchant_key']] = {
+                "merchant": t['merchant'], "category": t['category'], "first_date": date, "last_date": None,
+                "amount_count": 0, "amount_sum": 0.0, "amount_sumsq": 0.0,
+                "interval_count": 0, "interval_sum": 0.0, "interval_sumsq": 0.0,
+            }
+        if s['last_date'] is not None:
+            gap = (date - s['last_date']).total_seconds() / 86400
+            s['interval_count'] += 1
+            s['interval_sum'] += gap
+            s['interval_sumsq'] += gap * gap
+        s['last_date'] = date
+        s['last_amount'] = t['amount']
+        s['card_id'] = t['card_id']
+        s['amount_count'] += 1
+        s['amount_sum'] += t['amount']
+        s['amount_sumsq'] += t['amount'] * t['amount']
+    return by_merchant
+
+def _update_op(user_id: str, merchant_key: str, s: dict) -> UpdateOne:
+    """Merge a batch summary into the stored state in one atomic pipeline
+    update, bridging the gap from the stored last_date to the batch"""
+    first, last = s['first_date'], s['last_date']
+    stored = {"$ne": [{"$type": "$last_date"}, "missing"]}
+    is_latest = {"$gte": [last, {"$ifNull": ["$last_date", last]}]}
+    
+    def running(field, batch_value, gap_value):
+        return {"$add": [{"$ifNull": [f"${field}", 0]}, batch_value, {"$ifNull": [gap_value, 0]}]}
+    
+    return UpdateOne(
+        {"user_id": user_id, "merchant_key": merchant_key},
+        [
+            {"$set": {"_gap": {"$cond": [
+                {"$and": [stored, {"$gt": [first, "$last_date"]}]},
+                {"$divide": [{"$subtract": [first, "$last_date"]}, DAY_MS]},
+                None,
+            ]}}},
+            {"$set": {
+                # $literal: merchant data is free text and may start with "$".
+                "merchant": {"$ifNull": ["$merchant", {"$literal": s['merchant']}]},
+                "category": {"$ifNull": ["$category", {"$literal": s['category']}]},
+                "card_id": {"$cond": [is_latest, {"$literal": s['card_id']}, "$card_id"]},
+                "last_amount": {"$cond": [is_latest, s['last_amount'], "$last_amount"]},
+                "first_date": {"$min": ["$first_date", first]},
+                "last_date": {"$max": ["$last_date", last]},
+                "amount_count": running("amount_count", s['amount_count'], None),
+                "amount_sum": running("amount_sum", s['amount_sum'], None),
+                "amount_sumsq": running("amount_sumsq", s['amount_sumsq'], None),
+                "interval_count": running("interval_count", s['interval_count'],
+                                          {"$cond": [{"$eq": ["$_gap", None]}, 0, 1]}),
+                "interval_sum": running("interval_sum", s['interval_sum'], "$_gap"),
+                "interval_sumsq": running("interval_sumsq", s['interval_sumsq'], {"$multiply": ["$_gap", "$_gap"]}),
+            }},
+            {"$unset": "_gap"},
+        ],
+        upsert=True,
+    )
+
+async def apply_transactions(db, user_id: str, transactions: list, session=None):
+    """Fold freshly inserted transaction documents into the merchant state"""
+    if not transactions:
+        return
+    ops = [_update_op(user_id, merchant_key, s) for merchant_key, s in _fold(transactions).items()]
+    await db.recurring_merchants.bulk_write(ops, ordered=False, session=session)
+
+def _spread(count: int, total: float, sumsq: float):
+    """(mean, coefficient of variation) from running sums"""
+    mean = total / count
+    variance = max(sumsq / count - mean * mean, 0.0)
+    return mean, (math.sqrt(variance) / mean if mean > 0 else 0.0)
+
+def classify(state: dict, now: datetime = None):
+    """Cadence of a merchant's payments, or None if they don't repeat on a
+    weekly, monthly or annual rhythm.
+
+    Confidence multiplies how many intervals were seen, how regular they
+    are, how close their mean is to the nominal period and how stable the
+    amount is; 'active' is False once two periods pass with no payment.
+    """
+    if state.get('interval_count', 0) < 1:
+        return None
+    
+    mean_interval, interval_cv = _spread(state['interval_count'], state['interval_sum'], state['interval_sumsq'])
+    period = min(PERIODS, key=lambda p: abs(math.log(max(mean_interval, 0.01) / PERIODS[p][0])))
+    nominal, per_year = PERIODS[period]
+    deviation = abs(mean_interval - nominal) / (RECURRING_PERIOD_TOLERANCE * nominal)
+    if deviation > 1:
+        return None
+    
+    _, amount_cv = _spread(state['amount_count'], state['amount_sum'], state['amount_sumsq'])
+    support = 1 - 0.5 ** state['interval_count']
+    regularity = max(0.0, 1 - interval_cv)
+    closeness = 1 - 0.5 * deviation
+    amount_stability = 0.5 + 0.5 * max(0.0, 1 - amount_cv)
+    
+    now = now or datetime.now(timezone.utc)
+    next_expected = state['last_date'] + timedelta(days=mean_interval)
+    return {
+        "period": period,
+        "per_year": per_year,
+        "confidence": round(support * regularity * closeness * amount_stability, 2),
+        "avg_interval_days": round(mean_interval, 1),
+        "next_expected": next_expected,
+        "active": now - state['last_date'] <= timedelta(days=2 * nominal),
+    }
+
+async def load_recurring(db, user_id: str, min_confidence: float = RECURRING_MIN_CONFIDENCE, now: datetime = None) -> list:
+    """Active recurring merchants of a user, one indexed read"""
+    bills = []
+    query = {"user_id": user_id, "merchant_key": {"$exists": True}, "interval_count": {"$gte": 1}}
+    async for state in db.recurring_merchants.find(query, {"_id": 0}):
+        cadence = classify(state, now)
+        if cadence is None or not cadence['active'] or cadence['confidence'] < min_confidence:
+            continue
+        bills.append({
+            "merchant": state['merchant'],
+            "merchant_key": state['merchant_key'],
+            "category": state['category'],
+            "card_id": state['card_id'],
+            "total": state['amount_sum'],
+            "count": state['amount_count'],
+            **cadence,
+        })
+    return bills
+
+async def rebuild_user(db, user_id: str) -> int:
+    """Recompute one user's merchant state from their transactions. As with
+    rollups, writes that land while it runs may be dropped."""
+    transactions = await db.transactions.find(
+        {"user_id": user_id},
+        {"_id": 0, "merchant": 1, "merchant_key": 1, "category": 1, "card_id": 1, "amount": 1, "date": 1},
+    ).to_list(None)
+    for t in transactions:
+        # Not yet backfilled by `manage.py backfill-merchant-keys`.
+        if 'merchant_key' not in t:
+            t['merchant_key'] = normalize_merchant(t['merchant'])
+    await db.recurring_merchants.delete_many({"user_id": user_id})
+    await apply_transactions(db, user_id, transactions)
+    return len(transactions)
+
+async def rebuild_all(db) -> dict:
+    """Backfill merchant state for every user. Returns {user_id: transactions_seen}"""
+    results = {}
+    for user_id in await db.transactions.distinct("user_id"):
+        results[user_id] = await rebuild_user(db, user_id)
+        logger.info(f"Rebuilt recurring merchant state for {user_id} from {results[user_id]} transactions")
+    return results
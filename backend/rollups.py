@@ -0,0 +1,144 @@
+from pymongo import UpdateOne
+from collections import defaultdict
+import aggregations
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MerchantKeysMissingError(Exception):
+    pass
+
+# spending_rollups holds running totals per user, maintained with $inc on
+# every transaction write. One document per (user, kind, key):
+#   kind "category_month": category, month ("YYYY-MM")
+#   kind "merchant":       merchant_key (+ merchant name, category and card_id
+#                          of its first transaction)
+#   kind "card":           card_id
+# Each carries total (amount), count and points.
+
+def _month_of(date) -> str:
+    return date.strftime('%Y-%m')
+
+def _add(buckets: dict, t: dict):
+    """Fold one transaction into {(kind, key...): [total, count, points, first_tx]}"""
+    for bucket_key in (
+        ("category_month", t['category'], _month_of(t['date'])),
+        ("merchant", t['merchant_key']),
+        ("card", t['card_id']),
+    ):
+        bucket = buckets.get(bucket_key)
+        if bucket is None:
+            bucket = buckets[bucket_key] = [0.0, 0, 0, t]
+        bucket[0] += t['amount']
+        bucket[1] += 1
+        bucket[2] += t.get('points_earned', 0)
+
+def _update_ops(user_id: str, buckets: dict) -> list:
+    ops = []
+    for bucket_key, (total, count, points, first) in buckets.items():
+        kind = bucket_key[0]
+        selector = {"user_id": user_id, "kind": kind}
+        on_insert = {}
+        if kind == "category_month":
+            selector.update(category=bucket_key[1], month=bucket_key[2])
+        elif kind == "merchant":
+            selector['merchant_key'] = bucket_key[1]
+            on_insert = {"merchant": first['merchant'], "category": first['category'], "card_id": first['card_id']}
+        else:
+            selector['card_id'] = bucket_key[1]
+
+        update = {"$inc": {"total": total, "count": count, "points": points}}
+        if on_insert:
+            update['$setOnInsert'] = on_insert
+        ops.append(UpdateOne(selector, update, upsert=True))
+    return ops
+
+async def apply_transactions(db, user_id: str, transactions: list, session=None):
+    """Add freshly inserted transaction documents to the user's rollups"""
+    if not transactions:
+        return
+    buckets = {}
+    for t in transactions:
+        _add(buckets, t)
+    await db.spending_rollups.bulk_write(_update_ops(user_id, buckets), ordered=False, session=session)
+
+async def rebuild_user(db, user_id: str) -> int:
+    """Recompute one user's rollups from their raw transactions.
+
+    The grouping runs server-side (see aggregations.py), so only the
+    aggregates are transferred. Writes that land while it runs may be
+    dropped; run backfills during low traffic or re-run them afterwards.
+
+    Raises MerchantKeysMissingError until every transaction of the user
+    has a merchant_key.
+    """
+    if await db.transactions.find_one({"user_id": user_id, "merchant_key": {"$exists": False}}, {"_id": 1}):
+        # Merchant rollups would be keyed differently from the ones
+        # apply_transactions writes.
+        raise MerchantKeysMissingError(user_id)
+
+    buckets = {}
+    count = 0
+    for row in await aggregations.category_month_totals(db, user_id):
+        buckets[("category_month", row['_id']['category'], row['_id']['month'])] = [row['total'], row['count'], row['points'], None]
+        count += row['count']
+    for row in await aggregations.merchant_stats(db, user_id):
+        buckets[("merchant", row['_id'])] = [row['total'], row['count'], row['points'], row]
+    for row in await aggregations.card_usage(db, user_id):
+        buckets[("card", row['_id'])] = [row['total'], row['count'], row['points'], None]
+
+    await db.spending_rollups.delete_many({"user_id": user_id})
+    if buckets:
+        await db.spending_rollups.bulk_write(_update_ops(user_id, buckets), ordered=False)
+    return count
+
+async def rebuild_all(db) -> dict:
+    """Backfill rollups for every user. Returns {user_id: transactions_seen}"""
+    results = {}
+    for user_id in await db.transactions.distinct("user_id"):
+        results[user_id] = await rebuild_user(db, user_id)
+        logger.info(f"Rebuilt spending rollups for {user_id} from {results[user_id]} transactions")
+    return results
+
+ALL_KINDS = ("category_month", "merchant", "card")
+
+async def load_spending_summary(db, user_id: str, kinds=ALL_KINDS) -> dict:
+    """Read a user's rollups and shape them for the analytics readers.
+
+    Cost scales with categories x months + merchants + cards, not with the
+    number of transactions. Pass ``kinds`` to skip rollups a reader ignores.
+    """
+    category_totals = defaultdict(float)
+    monthly_totals = defaultdict(float)
+    category_monthly = defaultdict(dict)
+    merchants = {}
+    cards = {}
+    transaction_count = 0
+
+    query = {"user_id": user_id, "kind": {"$in": list(kinds)}}
+    async for r in db.spending_rollups.find(query, {"_id": 0}):
+        if r['kind'] == "category_month":
+            category_totals[r['category']] += r['total']
+            monthly_totals[r['month']] += r['total']
+            category_monthly[r['category']][r['month']] = r['total']
+            transaction_count += r['count']
+        elif r['kind'] == "merchant":
+            # Documents from before merchant_key existed are keyed by name until rebuilt.
+            merchants[r.get('merchant_key', r.get('merchant'))] = {
+                "merchant": r.get('merchant'),
+                "total": r['total'],
+                "count": r['count'],
+                "category": r.get('category'),
+                "card_id": r.get('card_id'),
+            }
+        elif r['kind'] == "card":
+            cards[r['card_id']] = {"total": r['total'], "count": r['count'], "points": r['points']}
+
+    return {
+        "transaction_count": transaction_count,
+        "category_totals": dict(category_totals),
+        "monthly_totals": dict(monthly_totals),
+        "category_monthly": dict(category_monthly),
+        "merchants": merchants,
+        "cards": cards,
+    }
@@ -1,42 +1,117 @@
-from fastapi import APIRouter, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Depends, Request, Response
+from typing import Optional
+from datetime import datetime
 from routes.auth import get_current_user
+from database import get_db
 from ml_service import MLService
 from llm_service import LLMService
+from rollups import load_spending_summary
+from aggregations import spending_breakdown
+from cache import VersionedCache
+from sse import sse_event, event_stream
+from etags import conditional_get
+import versions
 import os
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 ml_service = MLService()
 llm_service = LLMService()
 
-@router.get("/spending-patterns")
-async def get_spending_patterns(current_user: dict = Depends(get_current_user)):
-    transactions = await db.transactions.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
-    
-    from datetime import datetime
-    for t in transactions:
-        if isinstance(t['date'], str):
-            t['date'] = datetime.fromisoformat(t['date'])
+# Results keyed by (user, endpoint) and tagged with the user's transaction
+# version; a repeat dashboard load costs one data_versions read.
+analytics_cache = VersionedCache(
+    "analytics",
+    maxsize=int(os.environ.get('ANALYTICS_CACHE_SIZE', 5000)),
+    ttl=int(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', 3600)),
+    stale_while_revalidate=os.environ.get('ANALYTICS_STALE_WHILE_REVALIDATE', 'false').lower() == 'true',
+)
+
+async def _analyze(db, user_id: str):
+    summary = await load_spending_summary(db, user_id, kinds=("category_month",))
+    patterns = ml_service.analyze_spending_summary(
+        summary['transaction_count'], summary['category_totals'], summary['monthly_totals']
+    )
+    return summary, patterns
+
+async def _transactions_version(request: Request, db, user_id: str) -> int:
+    """Reuses the data_versions read by conditional_get when it ran"""
+    current = getattr(request.state, "data_versions", None)
+    if current is None:
+        current = await versions.get_versions(db, user_id)
+    return current.get(versions.TRANSACTIONS, 0)
+
+def _no_store(response: Response):
+    """For bodies that must not be revalidated under the current ETag"""
+    del response.headers["ETag"]
+    response.headers["Cache-Control"] = "no-store"
+
+@router.get("/spending-patterns", dependencies=[Depends(conditional_get(versions.TRANSACTIONS))])
+async def get_spending_patterns(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    user_id = current_user['id']
     
-    patterns = ml_service.analyze_spending_patterns(transactions)
+    async def compute():
+        _, patterns = await _analyze(db, user_id)
+        return patterns
     
+    patterns, stale = await analytics_cache.get_or_compute(
+        (user_id, "spending-patterns"), await _transactions_version(request, db, user_id), compute
+    )
+    if stale:
+        _no_store(response)
     return patterns
 
-@router.get("/insights")
-async def get_insights(current_user: dict = Depends(get_current_user)):
-    transactions = await db.transactions.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
+@router.get("/insights", dependencies=[Depends(conditional_get(versions.TRANSACTIONS))])
+async def get_insights(
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    user_id = current_user['id']
+    
+    async def compute():
+        summary, patterns = await _analyze(db, user_id)
+        insights, is_fallback = await llm_service.generate_spending_insights(summary['category_totals'], patterns, db=db)
+        return {"insights": insights, "patterns": patterns}, is_fallback
     
-    from datetime import datetime
-    for t in transactions:
-        if isinstance(t['date'], str):
-            t['date'] = datetime.fromisoformat(t['date'])
+    # A fallback written during an LLM outage is neither cached here nor
+    # given an ETag, so the next request tries the LLM again. Neither is a
+    # stale entry served while the current version is rebuilt.
+    (body, is_fallback), stale = await analytics_cache.get_or_compute(
+        (user_id, "insights"), await _transactions_version(request, db, user_id), compute,
+        cacheable=lambda value: not value[1],
+    )
+    if is_fallback or stale:
+        _no_store(response)
+    return body
+
+@router.get("/insights/stream")
+async def stream_insights(current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    """Server-sent events: ``patterns`` as soon as the local analysis is
+    done, then ``token`` events with the insight text, then ``done``"""
+    summary, patterns = await _analyze(db, current_user['id'])
     
-    patterns = ml_service.analyze_spending_patterns(transactions)
-    insights = await llm_service.generate_spending_insights(transactions, patterns)
+    async def events():
+        yield sse_event("patterns", patterns)
+        async for chunk in llm_service.stream_spending_insights(summary['category_totals'], patterns, db=db):
+            yield sse_event("token", {"text": chunk})
+        yield sse_event("done", {})
     
-    return {"insights": insights, "patterns": patterns}
+    return event_stream(events())
+
+@router.get("/breakdown", dependencies=[Depends(conditional_get(versions.TRANSACTIONS))])
+async def get_spending_breakdown(
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    """Category, monthly, merchant and per-card totals for any date range,
+    grouped server-side by MongoDB"""
+    return await spending_breakdown(db, current_user['id'], start_date, end_date)
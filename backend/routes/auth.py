@@ -1,16 +1,23 @@
 from fastapi import APIRouter, HTTPException, Depends, Header
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 from models import User, UserCreate, UserLogin, UserResponse
-from auth import hash_password, verify_password, create_access_token, decode_access_token
-import os
+from auth import (
+    hash_password, verify_password, create_user_token, decode_access_token, principal_from_claims,
+    PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL_SECONDS,
+)
+from database import get_db
+from cache import TTLCache
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# Users resolved by get_current_user, keyed by token subject. Anything that
+# modifies a user document must call invalidate_principal().
+principal_cache = TTLCache("principals", maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL_SECONDS)
 
-async def get_current_user(authorization: str = Header(None)):
+def invalidate_principal(user_id: str):
+    principal_cache.invalidate(user_id)
+
+async def get_current_user(authorization: str = Header(None), db=Depends(get_db)):
     if not authorization or not authorization.startswith('Bearer '):
         raise HTTPException(status_code=401, detail="Not authenticated")
     
@@ -20,14 +27,24 @@ async def get_current_user(authorization: str = Header(None)):
     if not payload:
         raise HTTPException(status_code=401, detail="Invalid token")
     
-    user = await db.users.find_one({"id": payload.get("sub")}, {"_id": 0})
+    principal = principal_from_claims(payload)
+    if principal:
+        return principal
+    
+    user_id = payload.get("sub")
+    user = principal_cache.get(user_id)
+    if user:
+        return user
+    
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
     
+    principal_cache.set(user_id, user)
     return user
 
 @router.post("/signup")
-async def signup(user_data: UserCreate):
+async def signup(user_data: UserCreate, db=Depends(get_db)):
     existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -35,15 +52,20 @@ async def signup(user_data: UserCreate):
     user = User(
         email=user_data.email,
         name=user_data.name,
-        password_hash=hash_password(user_data.password)
+        password_hash=await hash_password(user_data.password)
     )
     
     user_dict = user.model_dump()
-    user_dict['created_at'] = user_dict['created_at'].isoformat()
     
-    await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        # Concurrent signups with the same email race past the lookup above;
+        # the unique email index is the real guard.
+        raise HTTPException(status_code=400, detail="Email already registered")
     
-    token = create_access_token({"sub": user.id})
+    invalidate_principal(user.id)
+    token = create_user_token(user_dict)
     
     return {
         "token": token,
@@ -56,18 +78,22 @@ async def signup(user_data: UserCreate):
     }
 
 @router.post("/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, db=Depends(get_db)):
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
     
-    if not user or not verify_password(credentials.password, user['password_hash']):
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    valid, new_hash = await verify_password(credentials.password, user['password_hash'])
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    token = create_access_token({"sub": user['id']})
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS; upgrade it in place.
+        await db.users.update_one({"id": user['id']}, {"$set": {"password_hash": new_hash}})
+        invalidate_principal(user['id'])
     
-    from datetime import datetime
-    created_at = user['created_at']
-    if isinstance(created_at, str):
-        created_at = datetime.fromisoformat(created_at)
+    token = create_user_token(user)
     
     return {
         "token": token,
@@ -75,20 +101,15 @@ async def login(credentials: UserLogin):
             id=user['id'],
             email=user['email'],
             name=user['name'],
-            created_at=created_at
+            created_at=user['created_at']
         )
     }
 
 @router.get("/me")
 async def get_me(current_user: dict = Depends(get_current_user)):
-    from datetime import datetime
-    created_at = current_user['created_at']
-    if isinstance(created_at, str):
-        created_at = datetime.fromisoformat(created_at)
-    
     return UserResponse(
         id=current_user['id'],
         email=current_user['email'],
         name=current_user['name'],
-        created_at=created_at
+        created_at=current_user['created_at']
     )
@@ -1,77 +1,83 @@
-from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from models import CreditCard, CreditCardCreate, CreditCardResponse
 from routes.auth import get_current_user
+from database import get_db
+import versions
+import ranking_table
+import expiry_alerts
+from dates import as_utc
+from etags import conditional_get
+from serialization import projection, encode_document, encode_documents, encode_model, json_response
 from typing import List
-import os
 
 router = APIRouter(prefix="/cards", tags=["cards"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 @router.post("", response_model=CreditCardResponse)
-async def create_card(card_data: CreditCardCreate, current_user: dict = Depends(get_current_user)):
+async def create_card(card_data: CreditCardCreate, current_user: dict = Depends(get_current_user), db=Depends(get_db)):
     card = CreditCard(
         user_id=current_user['id'],
         **card_data.model_dump()
     )
+    if card.expiry_date:
+        card.expiry_date = as_utc(card.expiry_date)
     
-    card_dict = card.model_dump()
-    card_dict['created_at'] = card_dict['created_at'].isoformat()
-    
-    await db.credit_cards.insert_one(card_dict)
+    await db.credit_cards.insert_one(card.model_dump())
+    await versions.bump(db, current_user['id'], versions.CARDS)
+    await ranking_table.rebuild(db, current_user['id'])
+    await expiry_alerts.refresh_card(db, card.id)
     
-    return CreditCardResponse(**card.model_dump())
+    return json_response(encode_model(card, CreditCardResponse))
 
-@router.get("", response_model=List[CreditCardResponse])
-async def get_cards(current_user: dict = Depends(get_current_user)):
-    cards = await db.credit_cards.find({"user_id": current_user['id']}, {"_id": 0}).to_list(100)
-    
-    from datetime import datetime
-    for card in cards:
-        if isinstance(card['created_at'], str):
-            card['created_at'] = datetime.fromisoformat(card['created_at'])
-    
-    return [CreditCardResponse(**card) for card in cards]
+@router.get("", response_model=List[CreditCardResponse], dependencies=[Depends(conditional_get(versions.CARDS))])
+async def get_cards(request: Request, response: Response, current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    cards = await db.credit_cards.find({"user_id": current_user['id']}, projection(CreditCardResponse)).to_list(100)
+    return json_response(encode_documents(cards, CreditCardResponse), request, response)
 
-@router.get("/{card_id}", response_model=CreditCardResponse)
-async def get_card(card_id: str, current_user: dict = Depends(get_current_user)):
-    card = await db.credit_cards.find_one({"id": card_id, "user_id": current_user['id']}, {"_id": 0})
+@router.get("/rankings", dependencies=[Depends(conditional_get(versions.CARDS))])
+async def get_card_rankings(current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    """The compiled best-card-per-category table, for clients that rank
+    offline. cards_version changes whenever the table does."""
+    table = await ranking_table.load(db, current_user['id'])
+    table.pop('user_id', None)
+    return table
+
+@router.get("/{card_id}", response_model=CreditCardResponse, dependencies=[Depends(conditional_get(versions.CARDS))])
+async def get_card(card_id: str, response: Response, current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    card = await db.credit_cards.find_one({"id": card_id, "user_id": current_user['id']}, projection(CreditCardResponse))
     
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     
-    from datetime import datetime
-    if isinstance(card['created_at'], str):
-        card['created_at'] = datetime.fromisoformat(card['created_at'])
-    
-    return CreditCardResponse(**card)
+    return json_response(encode_document(card, CreditCardResponse), response=response)
 
 @router.put("/{card_id}", response_model=CreditCardResponse)
-async def update_card(card_id: str, card_data: CreditCardCreate, current_user: dict = Depends(get_current_user)):
+async def update_card(card_id: str, card_data: CreditCardCreate, current_user: dict = Depends(get_current_user), db=Depends(get_db)):
     card = await db.credit_cards.find_one({"id": card_id, "user_id": current_user['id']}, {"_id": 0})
     
     if not card:
         raise HTTPException(status_code=404, detail="Card not found")
     
     update_data = card_data.model_dump()
+    if update_data['expiry_date']:
+        update_data['expiry_date'] = as_utc(update_data['expiry_date'])
     await db.credit_cards.update_one({"id": card_id}, {"$set": update_data})
+    await versions.bump(db, current_user['id'], versions.CARDS)
+    await ranking_table.rebuild(db, current_user['id'])
+    await expiry_alerts.refresh_card(db, card_id)
     
-    updated_card = await db.credit_cards.find_one({"id": card_id}, {"_id": 0})
+    updated_card = await db.credit_cards.find_one({"id": card_id}, projection(CreditCardResponse))
     
-    from datetime import datetime
-    if isinstance(updated_card['created_at'], str):
-        updated_card['created_at'] = datetime.fromisoformat(updated_card['created_at'])
-    
-    return CreditCardResponse(**updated_card)
+    return json_response(encode_document(updated_card, CreditCardResponse))
 
 @router.delete("/{card_id}")
-async def delete_card(card_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_card(card_id: str, current_user: dict = Depends(get_current_user), db=Depends(get_db)):
     result = await db.credit_cards.delete_one({"id": card_id, "user_id": current_user['id']})
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Card not found")
     
+    await versions.bump(db, current_user['id'], versions.CARDS)
+    await ranking_table.rebuild(db, current_user['id'])
+    await expiry_alerts.refresh_card(db, card_id)
+    
     return {"message": "Card deleted successfully"}
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends, HTTPException
+from routes.auth import get_current_user
+from cache import CACHES
+from llm_gateway import llm_gateway
+import os
+
+# Comma-separated emails of the operators allowed to read internal metrics.
+# Empty (the default) disables the endpoints for everyone.
+METRICS_ADMIN_EMAILS = {
+    email.strip().lower() for email in os.environ.get('METRICS_ADMIN_EMAILS', '').split(',') if email.strip()
+}
+
+async def require_metrics_access(current_user: dict = Depends(get_current_user)):
+    if current_user.get('email', '').lower() not in METRICS_ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+router = APIRouter(prefix="/metrics", tags=["metrics"], dependencies=[Depends(require_metrics_access)])
+
+@router.get("/caches")
+async def get_cache_metrics():
+    """Hit/miss counters for every in-process cache"""
+    return {name: cache.stats() for name, cache in CACHES.items()}
+
+@router.get("/llm")
+async def get_llm_metrics():
+    """Concurrency, coalescing, timeout and circuit-breaker state of the LLM gateway"""
+    return llm_gateway.stats()
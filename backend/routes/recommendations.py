@@ -1,46 +1,108 @@
-from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, HTTPException, Depends, Query
 from models import RecommendationRequest, RecommendationResponse
 from routes.auth import get_current_user
+from database import get_db
 from llm_service import LLMService
-import os
+import ranking_table
+from datetime import datetime, timezone
+import asyncio
+import logging
+import uuid
 
 router = APIRouter(prefix="/recommendations", tags=["recommendations"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 llm_service = LLMService()
+logger = logging.getLogger(__name__)
+
+# Strong references to in-flight explanation tasks so they are not garbage
+# collected before they finish.
+_explanation_tasks = set()
+
+async def _write_explanation(db, explanation_id: str, request: RecommendationRequest, cards: list, best_card: dict):
+    try:
+        reason, is_fallback = await llm_service.explain_recommendation(
+            request.category, request.amount, cards, best_card, db=db
+        )
+        status = "failed" if is_fallback else "ready"
+    except Exception as e:
+        logger.warning(f"Explanation {explanation_id} failed: {e}")
+        reason = llm_service.fallback_reason(best_card)
+        status = "failed"
+    await db.recommendation_explanations.update_one(
+        {"id": explanation_id},
+        {"$set": {"status": status, "reason": reason, "completed_at": datetime.now(timezone.utc)}}
+    )
 
 @router.post("", response_model=RecommendationResponse)
-async def get_recommendation(request: RecommendationRequest, current_user: dict = Depends(get_current_user)):
-    cards = await db.credit_cards.find({"user_id": current_user['id']}, {"_id": 0}).to_list(100)
+async def get_recommendation(
+    request: RecommendationRequest,
+    explain: str = Query("sync", pattern="^(sync|async)$"),
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    """With explain=async the card and points are returned straight from
+    card_ranking, and the LLM reason is generated in the background; poll
+    GET /recommendations/explanations/{explanation_id} for it. If the LLM
+    is unavailable the explanation ends as "failed" with the rule-based
+    reason.
     
-    if not cards:
-        raise HTTPException(status_code=400, detail="No credit cards found. Please add a card first.")
-    
-    result = await llm_service.get_card_recommendation(
-        category=request.category,
-        amount=request.amount,
-        cards=cards
-    )
+    The card comes from the user's compiled ranking table, so no cards
+    are fetched."""
+    table = await ranking_table.load(db, current_user['id'])
+    cards = table['cards']
     
-    if not result['card_id']:
-        raise HTTPException(status_code=400, detail="Unable to generate recommendation")
+    recommended_card = ranking_table.best_card(table, request.category)
+    if recommended_card is None:
+        raise HTTPException(status_code=400, detail="No credit cards found. Please add a card first.")
     
-    recommended_card = next((c for c in cards if c['id'] == result['card_id']), None)
+    points_earned = int(request.amount * recommended_card['reward_rate'])
     
-    if not recommended_card:
-        raise HTTPException(status_code=404, detail="Recommended card not found")
+    if explain == "async":
+        explanation_id = str(uuid.uuid4())
+        await db.recommendation_explanations.insert_one({
+            "id": explanation_id,
+            "user_id": current_user['id'],
+            "card_id": recommended_card['id'],
+            "status": "pending",
+            "reason": None,
+            "created_at": datetime.now(timezone.utc),
+        })
+        task = asyncio.create_task(_write_explanation(db, explanation_id, request, cards, recommended_card))
+        _explanation_tasks.add(task)
+        task.add_done_callback(_explanation_tasks.discard)
+        
+        return RecommendationResponse(
+            card_id=recommended_card['id'],
+            card_name=recommended_card['card_name'],
+            bank_name=recommended_card['bank_name'],
+            reason=llm_service.fallback_reason(recommended_card),
+            points_earned=points_earned,
+            reward_rate=recommended_card['reward_rate'],
+            explanation_id=explanation_id,
+            explanation_status="pending"
+        )
     
-    points_earned = int(request.amount * recommended_card['reward_rate'])
+    reason, _ = await llm_service.explain_recommendation(
+        request.category, request.amount, cards, recommended_card, db=db
+    )
     
     return RecommendationResponse(
         card_id=recommended_card['id'],
         card_name=recommended_card['card_name'],
         bank_name=recommended_card['bank_name'],
-        reason=result['reason'],
+        reason=reason,
         points_earned=points_earned,
         reward_rate=recommended_card['reward_rate']
     )
+
+@router.get("/explanations/{explanation_id}")
+async def get_explanation(explanation_id: str, current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    explanation = await db.recommendation_explanations.find_one(
+        {"id": explanation_id, "user_id": current_user['id']},
+        {"_id": 0, "id": 1, "card_id": 1, "status": 1, "reason": 1}
+    )
+    
+    if not explanation:
+        raise HTTPException(status_code=404, detail="Explanation not found")
+    
+    return explanation
@@ -1,181 +1,57 @@
-from fastapi import APIRouter, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Depends, Request
 from routes.auth import get_current_user
-import os
+from database import get_db
+from rollups import load_spending_summary
+from card_catalog import CardCatalog, get_card_catalog, card_key
+from etags import json_body_response
+import ranking_table
 
 router = APIRouter(prefix="/referrals", tags=["referrals"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-# Popular Indian credit card offers with affiliate potential
-CARD_OFFERS = [
-    {
-        "id": "hdfc_regalia",
-        "bank": "HDFC Bank",
-        "name": "Regalia Credit Card",
-        "type": "premium",
-        "annual_fee": 2500,
-        "reward_rate": 4.0,
-        "welcome_bonus": 10000,
-        "categories": ["Travel", "Shopping", "Online Shopping"],
-        "benefits": [
-            "4 reward points per ₹150 spent",
-            "10,000 bonus points on ₹5L annual spend",
-            "Airport lounge access (6 domestic + 6 international)",
-            "Insurance cover up to ₹1 Cr"
-        ],
-        "best_for": "Travel & Shopping",
-        "referral_commission": 1500,
-        "apply_url": "https://www.hdfcbank.com/personal/pay/cards/credit-cards/regalia-credit-card"
-    },
-    {
-        "id": "sbi_simplyclick",
-        "bank": "SBI Card",
-        "name": "SimplyCLICK Credit Card",
-        "type": "rewards",
-        "annual_fee": 499,
-        "reward_rate": 5.0,
-        "welcome_bonus": 2000,
-        "categories": ["Online Shopping", "Food & Dining"],
-        "benefits": [
-            "10x reward points on partner brands",
-            "5x on other online spends",
-            "₹2000 Amazon voucher",
-            "1% fuel surcharge waiver"
-        ],
-        "best_for": "Online Shopping",
-        "referral_commission": 800,
-        "apply_url": "https://www.sbicard.com/en/personal/credit-cards/shopping/simplyclick-advantage-credit-card.page"
-    },
-    {
-        "id": "icici_amazon",
-        "bank": "ICICI Bank",
-        "name": "Amazon Pay ICICI Credit Card",
-        "type": "cashback",
-        "annual_fee": 0,
-        "reward_rate": 5.0,
-        "welcome_bonus": 2000,
-        "categories": ["Online Shopping"],
-        "benefits": [
-            "5% cashback on Amazon Prime",
-            "2% on Amazon without Prime",
-            "1% on other spends",
-            "Welcome ₹2000 Amazon Pay Gift Card"
-        ],
-        "best_for": "Amazon Shopping",
-        "referral_commission": 1000,
-        "apply_url": "https://www.icicibank.com/Personal-Banking/cards/credit-cards/amazon-pay-credit-card",
-        "co_branded": "Amazon"
-    },
-    {
-        "id": "axis_flipkart",
-        "bank": "Axis Bank",
-        "name": "Flipkart Axis Bank Credit Card",
-        "type": "cashback",
-        "annual_fee": 500,
-        "reward_rate": 4.0,
-        "welcome_bonus": 500,
-        "categories": ["Online Shopping"],
-        "benefits": [
-            "4% unlimited cashback on Flipkart",
-            "1.5% on groceries & bill payments",
-            "1% on other spends",
-            "₹500 Flipkart voucher"
-        ],
-        "best_for": "Flipkart Shopping",
-        "referral_commission": 900,
-        "apply_url": "https://www.axisbank.com/retail/cards/credit-card/flipkart-axis-bank-credit-card",
-        "co_branded": "Flipkart"
-    },
-    {
-        "id": "axis_vistara",
-        "bank": "Axis Bank",
-        "name": "Vistara Infinite Credit Card",
-        "type": "travel",
-        "annual_fee": 10000,
-        "reward_rate": 6.0,
-        "welcome_bonus": 15000,
-        "categories": ["Travel"],
-        "benefits": [
-            "15,000 Club Vistara points annually",
-            "2 complimentary tickets on renewal",
-            "Unlimited lounge access",
-            "6 CV points per ₹200 on Vistara"
-        ],
-        "best_for": "Frequent Flyers",
-        "referral_commission": 2000,
-        "apply_url": "https://www.axisbank.com/retail/cards/credit-card/vistara-credit-card",
-        "co_branded": "Vistara"
-    },
-    {
-        "id": "hdfc_swiggy",
-        "bank": "HDFC Bank",
-        "name": "Swiggy HDFC Bank Credit Card",
-        "type": "cashback",
-        "annual_fee": 500,
-        "reward_rate": 10.0,
-        "welcome_bonus": 250,
-        "categories": ["Food & Dining"],
-        "benefits": [
-            "10% cashback on Swiggy",
-            "5% cashback on Zomato, Uber",
-            "1% on other spends",
-            "3 months Swiggy One free"
-        ],
-        "best_for": "Food Delivery",
-        "referral_commission": 700,
-        "apply_url": "https://www.hdfcbank.com/personal/pay/cards/credit-cards/swiggy-hdfc-bank-credit-card",
-        "co_branded": "Swiggy"
-    }
-]
-
 @router.get("/recommended-cards")
-async def get_recommended_cards(current_user: dict = Depends(get_current_user)):
+async def get_recommended_cards(
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+    catalog: CardCatalog = Depends(get_card_catalog),
+):
     """Get card recommendations based on user's spending patterns"""
     
-    # Get user transactions to analyze spending
-    transactions = await db.transactions.find(
-        {"user_id": current_user['id']}, 
-        {"_id": 0}
-    ).to_list(1000)
+    # Spending by category and merchant from the maintained rollups
+    summary = await load_spending_summary(db, current_user['id'], kinds=("category_month", "merchant"))
+    category_spending = summary['category_totals']
     
-    # Analyze spending by category
-    category_spending = {}
-    for t in transactions:
-        category = t['category']
-        category_spending[category] = category_spending.get(category, 0) + t['amount']
-    
-    # Get user's current cards
-    user_cards = await db.credit_cards.find(
-        {"user_id": current_user['id']},
-        {"_id": 0}
-    ).to_list(100)
+    # Offers the user already holds, matched on the bank + name key
+    user_cards = (await ranking_table.load(db, current_user['id']))['cards']
+    owned = {
+        catalog.by_card_key[key]['id']
+        for key in (card_key(c['bank_name'], c['card_name']) for c in user_cards)
+        if key in catalog.by_card_key
+    }
     
-    user_card_names = [f"{c['bank_name']} {c['card_name']}" for c in user_cards]
+    # Score only the offers that share a category with the user's spending
+    scores = {}
+    for category, amount in category_spending.items():
+        for card in catalog.by_category.get(category, ()):
+            scores[card['id']] = scores.get(card['id'], 0) + amount * card['reward_rate']
     
-    # Filter out cards user already has
-    available_cards = [
-        card for card in CARD_OFFERS 
-        if f"{card['bank']} {card['name']}" not in user_card_names
-    ]
+    # Co-branded offers also score on spend at their brand, matched on the
+    # normalised merchant key ("AMZN Mktp" counts for the Amazon card)
+    matching_merchants = {}
+    for merchant_key, stats in summary['merchants'].items():
+        for card in catalog.by_co_brand.get(merchant_key, ()):
+            scores[card['id']] = scores.get(card['id'], 0) + stats['total'] * card['reward_rate']
+            matching_merchants.setdefault(card['id'], []).append(stats['merchant'] or merchant_key)
     
-    # Score cards based on user's spending
     scored_cards = []
-    for card in available_cards:
-        score = 0
-        matching_categories = []
-        
-        for category in card['categories']:
-            if category in category_spending:
-                score += category_spending[category] * card['reward_rate']
-                matching_categories.append(category)
-        
+    for card in catalog.offers:
+        if card['id'] in owned:
+            continue
+        score = scores.get(card['id'], 0)
         scored_cards.append({
             **card,
             'relevance_score': round(score, 2),
-            'matching_categories': matching_categories
+            'matching_categories': [c for c in card['categories'] if c in category_spending],
+            'matching_merchants': matching_merchants.get(card['id'], [])
         })
     
     # Sort by relevance
@@ -187,21 +63,27 @@ async def get_recommended_cards(current_user: dict = Depends(get_current_user)):
     }
 
 @router.get("/co-branded-cards")
-async def get_co_branded_cards():
+async def get_co_branded_cards(request: Request, catalog: CardCatalog = Depends(get_card_catalog)):
     """Get all co-branded credit cards"""
-    co_branded = [card for card in CARD_OFFERS if card.get('co_branded')]
-    return {"co_branded_cards": co_branded}
+    body, etag = catalog.listing("co_branded")
+    return json_body_response(request, body, etag)
 
 @router.get("/all-cards")
-async def get_all_cards():
+async def get_all_cards(request: Request, catalog: CardCatalog = Depends(get_card_catalog)):
     """Get all available card offers"""
-    return {"cards": CARD_OFFERS}
+    body, etag = catalog.listing("all")
+    return json_body_response(request, body, etag)
 
 @router.post("/track-application/{card_id}")
-async def track_card_application(card_id: str, current_user: dict = Depends(get_current_user)):
+async def track_card_application(
+    card_id: str,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+    catalog: CardCatalog = Depends(get_card_catalog),
+):
     """Track when user applies for a card (for commission tracking)"""
     
-    card = next((c for c in CARD_OFFERS if c['id'] == card_id), None)
+    card = catalog.by_id.get(card_id)
     if not card:
         return {"success": False, "message": "Card not found"}
     
@@ -212,7 +94,7 @@ async def track_card_application(card_id: str, current_user: dict = Depends(get_
         "card_name": f"{card['bank']} {card['name']}",
         "commission_amount": card['referral_commission'],
         "status": "pending",
-        "applied_at": datetime.now(timezone.utc).isoformat()
+        "applied_at": datetime.now(timezone.utc)
     }
     
     await db.card_applications.insert_one(application_log)
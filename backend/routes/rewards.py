@@ -1,73 +1,36 @@
 from fastapi import APIRouter, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
 from routes.auth import get_current_user
-from ml_service import MLService
-import os
+from database import get_db
+from etags import conditional_get
+import expiry_alerts
+import versions
 
 router = APIRouter(prefix="/rewards", tags=["rewards"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
-ml_service = MLService()
-
-@router.get("/expiry-alerts")
-async def get_expiry_alerts(current_user: dict = Depends(get_current_user)):
-    cards = await db.credit_cards.find({"user_id": current_user['id']}, {"_id": 0}).to_list(100)
-    transactions = await db.transactions.find({"user_id": current_user['id']}, {"_id": 0}).to_list(1000)
+@router.get("/expiry-alerts", dependencies=[Depends(conditional_get(versions.CARDS, refreshed_at=expiry_alerts.last_refreshed))])
+async def get_expiry_alerts(current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    """Precomputed by expiry_alerts; one indexed read plus the balances of
+    the cards it returns"""
+    alerts = await db.points_expiry_alerts.find(
+        {"user_id": current_user['id'], "risk_level": {"$in": ["high", "medium"]}},
+        {"_id": 0, "card_id": 1, "card_name": 1, "risk_level": 1, "message": 1, "days_until_expiry": 1},
+    ).sort("days_until_expiry", 1).to_list(100)
+    alerts = await expiry_alerts.with_balances(db, alerts)
     
-    alerts = []
-    for card in cards:
-        if card.get('points_balance', 0) > 0:
-            risk_analysis = ml_service.predict_expiry_risk(card, transactions)
-            if risk_analysis['risk'] in ['high', 'medium']:
-                alerts.append({
-                    "card_id": card['id'],
-                    "card_name": f"{card['bank_name']} {card['card_name']}",
-                    "points_balance": card['points_balance'],
-                    "risk_level": risk_analysis['risk'],
-                    "message": risk_analysis['message'],
-                    "days_until_expiry": risk_analysis.get('days', 0)
-                })
-    
-    return {"alerts": alerts}
+    return {"alerts": [alert for alert in alerts if alert['points_balance'] > 0]}
 
-@router.get("/all-expiry-dates")
-async def get_all_expiry_dates(current_user: dict = Depends(get_current_user)):
-    cards = await db.credit_cards.find({user_id": current_user['id']}, {"_id": 0}).to_list(100)
-    
-    expiry_info = []
-    for card in cards:
-        if card.get('expiry_date'):
-            from datetime import datetime
-            try:
-                expiry = datetime.fromisoformat(card['expiry_date'].replace('Z', '+00:00'))
-                now = datetime.now()
-                days_until_expiry = (expiry - now).days
-                
-                risk = "low"
-                if days_until_expiry < 30:
-                    risk = "high"
-                elif days_until_expiry < 90:
-                    risk = "medium"
-                
-                expiry_info.append({
-                    "card_id": card['id'],
-                    "card_name": f"{card['bank_name']} {card['card_name']}",
-                    "points_balance": card.get('points_balance', 0),
-                    "expiry_date": card['expiry_date'],
-                    "days_until_expiry": days_until_expiry,
-                    "risk_level": risk
-                })
-            except:
-                pass
+@router.get("/all-expiry-dates", dependencies=[Depends(conditional_get(versions.CARDS, refreshed_at=expiry_alerts.last_refreshed))])
+async def get_all_expiry_dates(current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    expiry_info = await db.points_expiry_alerts.find(
+        {"user_id": current_user['id']},
+        {"_id": 0, "card_id": 1, "card_name": 1, "expiry_date": 1, "days_until_expiry": 1, "risk_level": 1},
+    ).sort("days_until_expiry", 1).to_list(100)
+    expiry_info = await expiry_alerts.with_balances(db, expiry_info)
     
-    expiry_info.sort(key=lambda x: x['days_until_expiry'])
     return {"expiry_dates": expiry_info}
 
-@router.get("/redemption-suggestions")
-async def get_redemption_suggestions(current_user: dict = Depends(get_current_user)):
+@router.get("/redemption-suggestions", dependencies=[Depends(conditional_get(versions.CARDS))])
+async def get_redemption_suggestions(current_user: dict = Depends(get_current_user), db=Depends(get_db)):
     cards = await db.credit_cards.find({"user_id": current_user['id']}, {"_id": 0}).to_list(100)
     
     suggestions = []
@@ -1,48 +1,124 @@
-from fastapi import APIRouter, HTTPException, Depends
-from motor.motor_asyncio import AsyncIOMotorClient
-from models import Transaction, TransactionCreate, TransactionResponse
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from models import TransactionCreate, TransactionResponse
 from routes.auth import get_current_user
-from typing import List
-import os
+from database import get_db
+from transaction_service import record_transaction, CardNotFoundError
+from transaction_import import import_transactions, PARSERS
+from dates import as_utc
+from etags import conditional_get
+from merchants import normalize_merchant
+from serialization import projection, encode_documents, encode_model, json_response
+import versions
+from typing import List, Optional
+from datetime import datetime
+import base64
+import json
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
-
 @router.post("", response_model=TransactionResponse)
-async def create_transaction(transaction_data: TransactionCreate, current_user: dict = Depends(get_current_user)):
-    card = await db.credit_cards.find_one({"id": transaction_data.card_id, "user_id": current_user['id']}, {"_id": 0})
-    
-    if not card:
+async def create_transaction(transaction_data: TransactionCreate, current_user: dict = Depends(get_current_user), db=Depends(get_db)):
+    try:
+        transaction = await record_transaction(db, current_user['id'], transaction_data)
+    except CardNotFoundError:
         raise HTTPException(status_code=404, detail="Card not found")
     
-    transaction = Transaction(
-        user_id=current_user['id'],
-        **transaction_data.model_dump()
-    )
-    
-    transaction_dict = transaction.model_dump()
-    transaction_dict['date'] = transaction_dict['date'].isoformat()
-    
-    await db.transactions.insert_one(transaction_dict)
+    return json_response(encode_model(transaction, TransactionResponse))
+
+@router.post("/import")
+async def import_transaction_history(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    ordered: bool = False,
+    batch_size: int = Query(500, ge=1, le=5000),
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    """Bulk import from a raw CSV (with header) or NDJSON request body.
+
+    The body is parsed as it streams in, so uploads of any size use constant
+    memory. Columns/keys match TransactionCreate plus an optional ISO date.
+    """
+    rows = PARSERS[format](request.stream())
+    return await import_transactions(db, current_user['id'], rows, ordered=ordered, batch_size=batch_size)
+
+def encode_cursor(transaction: dict) -> str:
+    # as_utc: dates not yet converted by migrate-dates are still strings.
+    raw = json.dumps([as_utc(transaction['date']).isoformat(), transaction['id']]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        date, transaction_id = json.loads(base64.urlsafe_b64decode(padded))
+        return as_utc(datetime.fromisoformat(date)), transaction_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def _has_string_dates(db, user_id: str) -> bool:
+    """Whether migrate-dates has yet to convert any of the user's rows (an
+    index-bounded probe on user_id_date_id)"""
+    return await db.transactions.find_one({"user_id": user_id, "date": {"$type": "string"}}, {"_id": 1}) is not None
+
+@router.get("", response_model=List[TransactionResponse], dependencies=[Depends(conditional_get(versions.TRANSACTIONS))])
+async def get_transactions(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    card_id: Optional[str] = None,
+    category: Optional[str] = None,
+    merchant: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    current_user: dict = Depends(get_current_user),
+    db=Depends(get_db),
+):
+    """Newest-first transactions, keyset-paginated on (date, id).
+
+    When more rows exist the X-Next-Cursor response header holds the cursor
+    for the following page. Every filter is an equality or range predicate
+    on a field covered by one of the user_id_*_date_id indexes, so fetching
+    page N is as cheap as page 1.
     
-    new_balance = card['points_balance'] + transaction_data.points_earned
-    await db.credit_cards.update_one(
-        {"id": transaction_data.card_id},
-        {"$set": {"points_balance": new_balance}}
-    )
+    Dates stored as ISO strings by releases before `manage.py migrate-dates`
+    never match a date range (MongoDB compares values of one BSON type
+    only) and sort after every real date. Until that user's rows are
+    migrated, cursors and date filters are refused with 409; the first page
+    still lists everything.
+    """
+    query = {"user_id": current_user['id']}
+    if card_id:
+        query['card_id'] = card_id
+    if category:
+        query['category'] = category
+    if merchant:
+        # Matches every spelling of the merchant, e.g. "Swiggy" and "SWIGGY*ORDER 1234".
+        query['merchant_key'] = normalize_merchant(merchant)
+    if start_date or end_date:
+        query['date'] = {}
+        if start_date:
+            query['date']['$gte'] = as_utc(start_date)
+        if end_date:
+            query['date']['$lt'] = as_utc(end_date)
+    if (cursor or 'date' in query) and await _has_string_dates(db, current_user['id']):
+        raise HTTPException(
+            status_code=409,
+            detail="Some transactions still have string dates; run `manage.py migrate-dates` first",
+        )
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        query['$or'] = [
+            {"date": {"$lt": last_date}},
+            {"date": last_date, "id": {"$lt": last_id}},
+        ]
     
-    return TransactionResponse(**transaction.model_dump())
-
-@router.get("", response_model=List[TransactionResponse])
-async def get_transactions(current_user: dict = Depends(get_current_user)):
-    transactions = await db.transactions.find({"user_id": current_user['id']}, {"_id": 0}).sort("date", -1).to_list(100)
+    transactions = await db.transactions.find(query, projection(TransactionResponse)).sort(
+        [("date", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
     
-    from datetime import datetime
-    for t in transactions:
-        if isinstance(t['date'], str):
-            t['date'] = datetime.fromisoformat(t['date'])
+    if len(transactions) > limit:
+        transactions = transactions[:limit]
+        response.headers['X-Next-Cursor'] = encode_cursor(transactions[-1])
     
-    return [TransactionResponse(**t) for t in transactions]
+    return json_response(encode_documents(transactions, TransactionResponse), request, response)
@@ -0,0 +1,77 @@
+from fastapi import Request, Response
+from functools import lru_cache
+from pydantic import TypeAdapter
+from datetime import date, datetime
+from typing import List
+import gzip
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+# Trust documents read from Mongo to already have the response model's
+# shape (they are written from the same models) and encode them directly;
+# with 'false' they are validated once by pydantic-core instead of being
+# built into models and then re-validated by response_model.
+RESPONSE_TRUST_DB = os.environ.get('RESPONSE_TRUST_DB', 'true').lower() == 'true'
+# List responses at least this large are gzipped for clients that accept
+# it; 0 disables compression.
+RESPONSE_GZIP_MIN_BYTES = int(os.environ.get('RESPONSE_GZIP_MIN_BYTES', 65536))
+RESPONSE_GZIP_LEVEL = int(os.environ.get('RESPONSE_GZIP_LEVEL', 5))
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+def projection(model) -> dict:
+    """Mongo projection returning exactly the model's fields"""
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+@lru_cache(maxsize=None)
+def _list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+def encode_documents(docs: list, model) -> bytes:
+    if RESPONSE_TRUST_DB:
+        return dumps(docs)
+    adapter = _list_adapter(model)
+    return adapter.dump_json(adapter.validate_python(docs))
+
+def encode_document(doc: dict, model) -> bytes:
+    if RESPONSE_TRUST_DB:
+        return dumps(doc)
+    return model.model_validate(doc).model_dump_json()
+
+def encode_model(instance, model) -> bytes:
+    """Serialize a freshly built model straight to JSON, limited to the
+    response model's fields; nothing needs validating again"""
+    return instance.model_dump_json(include=set(model.model_fields)).encode("utf-8")
+
+def gzip_etag(etag: str) -> str:
+    """Tag of the gzip-encoded variant; a strong ETag must differ between
+    content codings of the same resource"""
+    return etag[:-1] + '-gzip"' if etag.endswith('"') else etag
+
+def json_response(body: bytes, request: Request = None, response: Response = None) -> Response:
+    """Wrap encoded JSON. Headers set on the route's injected ``response``
+    (ETag, cursors) are carried over, since FastAPI drops them when a route
+    returns a Response itself. Bodies over RESPONSE_GZIP_MIN_BYTES are
+    gzipped when ``request`` accepts it, under their own ETag."""
+    headers = dict(response.headers) if response is not None else {}
+    if request is not None and RESPONSE_GZIP_MIN_BYTES:
+        headers["Vary"] = "Accept-Encoding"
+        if len(body) >= RESPONSE_GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+            body = gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL)
+            headers["Content-Encoding"] = "gzip"
+            if "etag" in headers:
+                headers["etag"] = gzip_etag(headers["etag"])
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,7 +1,8 @@
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -9,13 +10,42 @@ from pathlib import Path
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+from database import MongoDatabase
+from indexes import ensure_indexes
+from auth import shutdown_password_executor
+from llm_gateway import warm_up as warm_up_llm
+from card_catalog import card_catalog
+import expiry_alerts
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    mongo = MongoDatabase.from_env()
+    await mongo.connect(warm_up=os.environ.get('MONGO_WARM_UP', 'true').lower() == 'true')
+    app.state.mongo = mongo
+    # Fail at startup, not on the first referral request, if the offer file is broken.
+    card_catalog.refresh()
+    if os.environ.get('MONGO_ENSURE_INDEXES', 'true').lower() == 'true':
+        await ensure_indexes(mongo.db)
+    if os.environ.get('LLM_WARM_UP', 'true').lower() == 'true':
+        # Heavy LLM client libraries load in the background so the first
+        # insight request doesn't pay for them, without delaying startup.
+        app.state.llm_warm_up = asyncio.get_running_loop().run_in_executor(None, warm_up_llm)
+    scheduler = None
+    if expiry_alerts.EXPIRY_ALERTS_SCHEDULER:
+        scheduler = asyncio.create_task(expiry_alerts.run_scheduler(mongo.db))
+    try:
+        yield
+    finally:
+        if scheduler is not None:
+            scheduler.cancel()
+            with suppress(asyncio.CancelledError):
+                await scheduler
+        mongo.close()
+        shutdown_password_executor()
 
-from routes import auth, cards, recommendations, transactions, analytics, rewards, optimizer, referrals
+app = FastAPI(lifespan=lifespan)
+
+from routes import auth, cards, recommendations, transactions, analytics, rewards, optimizer, referrals, metrics
 
 app.include_router(auth.router, prefix="/api")
 app.include_router(cards.router, prefix="/api")
@@ -25,6 +55,7 @@ app.include_router(analytics.router, prefix="/api")
 app.include_router(rewards.router, prefix="/api")
 app.include_router(optimizer.router, prefix="/api")
 app.include_router(referrals.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +63,7 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
 logging.basicConfig(
@@ -39,7 +71,3 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
-
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
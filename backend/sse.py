@@ -0,0 +1,17 @@
+from fastapi.responses import StreamingResponse
+import json
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event; ``data`` is sent as JSON"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def event_stream(events) -> StreamingResponse:
+    """Wrap an async generator of sse_event strings. When the client
+    disconnects Starlette cancels the generator, and with it any LLM call
+    it is waiting on."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Disable proxy buffering (nginx) so tokens reach the client as sent.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,180 @@
+from models import TransactionImportRow
+from transaction_service import build_transaction_document
+import recurring
+import rollups
+import versions
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from collections import defaultdict
+import codecs
+import csv
+import json
+import time
+
+MAX_REPORTED_ERRORS = 100
+
+async def iter_lines(chunks):
+    """Split an async stream of byte chunks into decoded lines without
+    buffering more than one partial line."""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line.rstrip('\r')
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending.rstrip('\r')
+
+async def iter_csv_rows(chunks):
+    """Yields (row_number, dict) for a CSV stream with a header row.
+
+    Records must not contain embedded newlines.
+    """
+    header = None
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row_number += 1
+        yield row_number, dict(zip(header, values))
+
+async def iter_ndjson_rows(chunks):
+    row_number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield row_number, ValueError("Expected a JSON object")
+            continue
+        yield row_number, row
+
+PARSERS = {
+    "csv": iter_csv_rows,
+    "ndjson": iter_ndjson_rows,
+}
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    def add_error(self, row_number: int, error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "error": error})
+
+    def to_dict(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        processed = self.inserted + self.failed
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+async def _flush(db, user_id: str, batch: list, ordered: bool, report: ImportReport) -> bool:
+    """Insert one batch of (row_number, document) pairs. Returns False if an
+    ordered import hit a write error and must stop."""
+    documents = [document for _, document in batch]
+    failed_indexes = set()
+    try:
+        await db.transactions.insert_many(documents, ordered=ordered)
+    except BulkWriteError as e:
+        for write_error in e.details.get('writeErrors', []):
+            failed_indexes.add(write_error['index'])
+            report.add_error(batch[write_error['index']][0], write_error.get('errmsg', 'Write failed'))
+        if ordered:
+            # insert_many stops at the first error; everything after it was skipped.
+            first_failure = min(failed_indexes)
+            for row_number, _ in batch[first_failure + 1:]:
+                report.add_error(row_number, "Skipped after earlier error (ordered import)")
+            failed_indexes.update(range(first_failure, len(batch)))
+
+    inserted = [document for index, (_, document) in enumerate(batch) if index not in failed_indexes]
+    report.inserted += len(inserted)
+    if inserted:
+        # Everything derived from the batch is written with it, so an upload
+        # that breaks off later leaves balances and versions consistent.
+        points_by_card = defaultdict(int)
+        for document in inserted:
+            points_by_card[document['card_id']] += document['points_earned']
+        await db.credit_cards.bulk_write([
+            UpdateOne({"id": card_id, "user_id": user_id}, {"$inc": {"points_balance": points}})
+            for card_id, points in points_by_card.items()
+        ], ordered=False)
+        await rollups.apply_transactions(db, user_id, inserted)
+        await recurring.apply_transactions(db, user_id, inserted)
+        await versions.bump(db, user_id, versions.TRANSACTIONS, versions.CARDS)
+    return not (ordered and failed_indexes)
+
+async def import_transactions(db, user_id: str, rows, ordered: bool = False, batch_size: int = 500) -> dict:
+    """Validate and insert a stream of (row_number, dict) rows in batches.
+
+    Card balances are credited with one aggregated $inc per card for each
+    written batch. With ordered=True the import stops at the first invalid
+    or failing row and reports the remaining rows as skipped; otherwise bad
+    rows are reported and skipped.
+    """
+    report = ImportReport()
+    card_ids = {
+        card['id'] for card in
+        await db.credit_cards.find({"user_id": user_id}, {"_id": 0, "id": 1}).to_list(None)
+    }
+
+    batch = []
+    stopped = False
+    async for row_number, raw in rows:
+        if stopped:
+            report.add_error(row_number, "Skipped after earlier error (ordered import)")
+            continue
+
+        if isinstance(raw, Exception):
+            report.add_error(row_number, str(raw))
+            stopped = ordered
+            continue
+
+        try:
+            row = TransactionImportRow(**{k: v for k, v in raw.items() if v != ''})
+        except ValidationError as e:
+            report.add_error(row_number, "; ".join(
+                f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()
+            ))
+            stopped = ordered
+            continue
+
+        if row.card_id not in card_ids:
+            report.add_error(row_number, "Card not found")
+            stopped = ordered
+            continue
+
+        _, document = build_transaction_document(user_id, row)
+        batch.append((row_number, document))
+        if len(batch) >= batch_size:
+            keep_going = await _flush(db, user_id, batch, ordered, report)
+            batch = []
+            stopped = not keep_going
+
+    # For an ordered import that stopped on a bad row, the rows before it
+    # are still written, matching insert_many(ordered=True) semantics.
+    if batch:
+        await _flush(db, user_id, batch, ordered, report)
+
+    return report.to_dict()
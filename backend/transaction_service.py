@@ -0,0 +1,72 @@
+from models import Transaction, TransactionCreate
+from pymongo import ReturnDocument
+from merchants import normalize_merchant
+import recurring
+import rollups
+import versions
+from dates import as_utc
+import os
+
+# Set MONGO_TRANSACTIONS=true when Mongo runs as a replica set to make the
+# balance increment and the transaction insert a single atomic unit.
+MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', 'false').lower() == 'true'
+
+class CardNotFoundError(Exception):
+    pass
+
+def build_transaction_document(user_id: str, transaction_data: TransactionCreate):
+    """Returns the Transaction model and the dict to store in Mongo"""
+    transaction = Transaction(user_id=user_id, **transaction_data.model_dump(exclude_none=True))
+    transaction.date = as_utc(transaction.date)
+    transaction_dict = transaction.model_dump()
+    transaction_dict['merchant_key'] = normalize_merchant(transaction.merchant)
+    return transaction, transaction_dict
+
+async def _apply(db, user_id: str, transaction_data: TransactionCreate, session=None) -> Transaction:
+    # Ownership check and balance update in one round trip. $inc is applied
+    # server-side, so concurrent transactions on the same card cannot
+    # overwrite each other's points.
+    card = await db.credit_cards.find_one_and_update(
+        {"id": transaction_data.card_id, "user_id": user_id},
+        {"$inc": {"points_balance": transaction_data.points_earned}},
+        projection={"_id": 0, "id": 1},
+        return_document=ReturnDocument.AFTER,
+        session=session,
+    )
+    if not card:
+        raise CardNotFoundError(transaction_data.card_id)
+
+    transaction, transaction_dict = build_transaction_document(user_id, transaction_data)
+
+    try:
+        await db.transactions.insert_one(transaction_dict, session=session)
+    except Exception:
+        if session is None:
+            # No multi-document transaction to roll back: undo the increment.
+            await db.credit_cards.update_one(
+                {"id": transaction_data.card_id},
+                {"$inc": {"points_balance": -transaction_data.points_earned}},
+            )
+        raise
+
+    await rollups.apply_transactions(db, user_id, [transaction_dict], session=session)
+    await recurring.apply_transactions(db, user_id, [transaction_dict], session=session)
+    await versions.bump(db, user_id, versions.TRANSACTIONS, versions.CARDS, session=session)
+    return transaction
+
+async def record_transaction(db, user_id: str, transaction_data: TransactionCreate) -> Transaction:
+    """Insert a transaction and credit its points to the owning card.
+
+    Raises CardNotFoundError if the card does not exist or belongs to
+    another user.
+    """
+    if not MONGO_TRANSACTIONS:
+        return await _apply(db, user_id, transaction_data)
+
+    async def apply(session):
+        return await _apply(db, user_id, transaction_data, session=session)
+
+    # with_transaction retries the whole unit on TransientTransactionError
+    # and the commit on UnknownTransactionCommitResult.
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(apply)
@@ -0,0 +1,19 @@
+# Per-user data versions, one document per user in data_versions:
+#   {"user_id": ..., "transactions": <int>, "cards": <int>}
+# Every write to a resource bumps its counter, so readers can tell whether
+# anything changed since a cached result was built with a single indexed read.
+
+TRANSACTIONS = "transactions"
+CARDS = "cards"
+
+async def bump(db, user_id: str, *resources: str, session=None):
+    await db.data_versions.update_one(
+        {"user_id": user_id},
+        {"$inc": {resource: 1 for resource in resources}},
+        upsert=True,
+        session=session,
+    )
+
+async def get_versions(db, user_id: str) -> dict:
+    doc = await db.data_versions.find_one({"user_id": user_id}, {"_id": 0, "user_id": 0})
+    return doc or {}
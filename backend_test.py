@@ -1,6 +1,7 @@
 import requests
 import sys
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 class CredMaxAPITester:
@@ -201,6 +202,74 @@ class CredMaxAPITester:
         )
         return bool(response)
 
+    def test_concurrent_transactions(self, count=200, points=7):
+        """Test that parallel transactions on one card never lose points"""
+        if not self.card_id:
+            self.log_test("Concurrent Transactions", False, "No card ID available")
+            return False
+        
+        headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {self.token}'}
+        card_url = f"{self.base_url}/cards/{self.card_id}"
+        before = requests.get(card_url, headers=headers, timeout=30).json().get('points_balance', 0)
+        
+        transaction_data = {
+            "card_id": self.card_id,
+            "amount": 10.0,
+            "category": "Groceries",
+            "merchant": "BigBasket",
+            "points_earned": points
+        }
+        
+        def post_transaction(_):
+            return requests.post(f"{self.base_url}/transactions", json=transaction_data, headers=headers, timeout=60).status_code
+        
+        print(f"\n🔍 Testing Concurrent Transactions ({count} parallel inserts)...")
+        with ThreadPoolExecutor(max_workers=50) as pool:
+            statuses = list(pool.map(post_transaction, range(count)))
+        
+        succeeded = statuses.count(200)
+        after = requests.get(card_url, headers=headers, timeout=30).json().get('points_balance', 0)
+        expected = before + succeeded * points
+        
+        success = succeeded == count and after == expected
+        self.log_test(
+            "Concurrent Transactions",
+            success,
+            f"{succeeded}/{count} succeeded, balance {after}, expected {expected}"
+        )
+        return success
+
+    def test_conditional_get(self):
+        """Test that unchanged cards answer 304 and a write changes the ETag"""
+        if not self.card_id:
+            self.log_test("Conditional GET", False, "No card ID available")
+            return False
+        
+        headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {self.token}'}
+        url = f"{self.base_url}/cards"
+        
+        print(f"\n🔍 Testing Conditional GET...")
+        etag = requests.get(url, headers=headers, timeout=30).headers.get('ETag')
+        unchanged = requests.get(url, headers={**headers, 'If-None-Match': etag or ''}, timeout=30)
+        
+        requests.post(f"{self.base_url}/transactions", json={
+            "card_id": self.card_id,
+            "amount": 100.0,
+            "category": "Groceries",
+            "merchant": "BigBasket",
+            "points_earned": 1
+        }, headers=headers, timeout=30)
+        changed = requests.get(url, headers={**headers, 'If-None-Match': etag or ''}, timeout=30)
+        
+        success = bool(etag) and unchanged.status_code == 304 and changed.status_code == 200 \
+            and changed.headers.get('ETag') != etag
+        self.log_test(
+            "Conditional GET",
+            success,
+            f"ETag {etag}, unchanged -> {unchanged.status_code}, after write -> {changed.status_code}"
+        )
+        return success
+
     def test_get_transactions(self):
         """Test getting all transactions"""
         response = self.run_test(
@@ -332,6 +401,8 @@ class CredMaxAPITester:
         # Transaction Tests
         print("\n💰 TRANSACTION TESTS")
         self.test_create_transaction()
+        self.test_concurrent_transactions()
+        self.test_conditional_get()
         self.test_get_transactions()
 
         # Analytics Tests
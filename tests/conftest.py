@@ -0,0 +1,6 @@
+from pathlib import Path
+import sys
+
+# Backend modules import each other flat (`from database import get_db`),
+# as they do when uvicorn runs from backend/.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+from benchmarks.bench_optimizer import make_cards, make_merchants, score_loop
+from card_scoring import score_merchants
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_reference_loop(seed):
+    rng = random.Random(seed)
+    cards = make_cards(rng.randint(1, 12), rng)
+    merchants = make_merchants(rng.randint(0, 300), cards, rng)
+
+    assert score_merchants(cards, merchants) == score_loop(cards, merchants)
+
+def test_unknown_current_card_earns_base_rate_of_one():
+    cards = [{"id": "a", "bank_name": "HDFC", "card_name": "Millennia", "reward_rate": 2.0, "categories": ["Dining"]}]
+    merchants = [{"merchant": "Zomato", "category": "Dining", "card_id": "deleted", "total": 1000, "count": 2}]
+
+    [record] = score_merchants(cards, merchants)
+
+    assert record['current_card'] == "Unknown"
+    assert record['current_points'] == 500
+    assert record['points_gain'] == record['optimized_points'] - 500
+
+def test_per_year_scales_annual_estimate():
+    cards = [
+        {"id": "a", "bank_name": "SBI", "card_name": "SimplyCLICK", "reward_rate": 1.0, "categories": []},
+        {"id": "b", "bank_name": "Axis", "card_name": "ACE", "reward_rate": 5.0, "categories": []},
+    ]
+    merchants = [{"merchant": "Netflix", "category": "Entertainment", "card_id": "a", "total": 600, "count": 1, "per_year": 1}]
+
+    [record] = score_merchants(cards, merchants)
+
+    assert record['annual_gain_estimate'] == record['points_gain']
+
+def test_no_cards_or_merchants():
+    assert score_merchants([], []) == []
@@ -0,0 +1,64 @@
+from itertools import combinations
+import random
+
+import pytest
+
+from clustering import ckmeans
+
+def within_ss(values, labels):
+    total = 0.0
+    for label in set(labels):
+        members = [v for v, l in zip(values, labels) if l == label]
+        mean = sum(members) / len(members)
+        total += sum((v - mean) ** 2 for v in members)
+    return total
+
+def brute_force_ss(values, k):
+    """Lowest within-cluster SS over every split of the sorted values into
+    k contiguous runs"""
+    xs = sorted(values)
+    best = None
+    for cuts in combinations(range(1, len(xs)), k - 1):
+        bounds = (0, *cuts, len(xs))
+        labels = [i for i in range(k) for _ in range(bounds[i], bounds[i + 1])]
+        cost = within_ss(xs, labels)
+        best = cost if best is None else min(best, cost)
+    return best
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_brute_force(seed):
+    rng = random.Random(seed)
+    values = [rng.choice([rng.randint(0, 20), round(rng.uniform(0, 1000), 2)]) for _ in range(rng.randint(1, 9))]
+    k = rng.randint(1, 4)
+
+    labels = ckmeans(values, k)
+
+    levels = min(k, len(set(values)))
+    assert sorted(set(labels)) == list(range(levels))
+    assert within_ss(values, labels) == pytest.approx(brute_force_ss(values, levels), abs=1e-6)
+
+@pytest.mark.parametrize("seed", range(50))
+def test_labels_ordered_by_level_and_ties_share_a_label(seed):
+    rng = random.Random(seed)
+    values = [rng.randint(0, 5) * 100 for _ in range(rng.randint(1, 12))]
+
+    labels = ckmeans(values, 3)
+
+    by_value = {}
+    for value, label in zip(values, labels):
+        assert by_value.setdefault(value, label) == label
+    ordered = [by_value[value] for value in sorted(by_value)]
+    assert ordered == sorted(ordered)
+
+def test_identical_values_form_one_level():
+    assert ckmeans([5, 5, 5], 3) == [0, 0, 0]
+
+def test_k_is_capped_at_distinct_values():
+    assert ckmeans([1, 1, 1, 10], 3) == [0, 0, 0, 1]
+
+def test_input_order_is_preserved():
+    assert ckmeans([3, 1, 2], 3) == [2, 0, 1]
+    assert ckmeans([1000, 1, 2, 990], 2) == [1, 0, 0, 1]
+
+def test_empty():
+    assert ckmeans([], 3) == []
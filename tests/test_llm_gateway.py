@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+import llm_gateway
+from llm_gateway import CircuitBreaker, CircuitOpenError, LLMGateway
+
+class FakeChat:
+    def __init__(self, sdk):
+        self.sdk = sdk
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        self.sdk.sent.append(message.text)
+        await self.sdk.release.wait()
+        if self.sdk.error:
+            raise self.sdk.error
+        return f"reply to {message.text}"
+
+class FakeSDK:
+    def __init__(self):
+        self.sent = []
+        self.error = None
+        self.release = asyncio.Event()
+
+    def LlmChat(self, **kwargs):
+        return FakeChat(self)
+
+    class UserMessage:
+        def __init__(self, text):
+            self.text = text
+
+@pytest.fixture
+def sdk(monkeypatch):
+    fake = FakeSDK()
+    monkeypatch.setattr(llm_gateway, "load_llm_chat", lambda: fake)
+    return fake
+
+def test_breaker_opens_after_threshold_and_half_opens(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(llm_gateway.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock[0] += 10
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    # Only one trial call at a time.
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.consecutive_failures == 0
+
+def test_identical_prompts_share_one_call(sdk):
+    gateway = LLMGateway(max_concurrency=4, timeout=5)
+
+    async def run():
+        callers = [asyncio.create_task(gateway.send("s", "system", "prompt")) for _ in range(5)]
+        other = asyncio.create_task(gateway.send("s", "system", "another prompt"))
+        await asyncio.sleep(0)
+        sdk.release.set()
+        return await asyncio.gather(*callers, other)
+
+    results = asyncio.run(run())
+
+    assert results == ["reply to prompt"] * 5 + ["reply to another prompt"]
+    assert sorted(sdk.sent) == ["another prompt", "prompt"]
+    assert gateway.calls == 2
+    assert gateway.coalesced == 4
+    assert gateway.stats()['in_flight'] == 0
+
+def test_failures_trip_the_breaker(sdk):
+    gateway = LLMGateway(timeout=5, failure_threshold=2, reset_seconds=60)
+    sdk.error = RuntimeError("provider down")
+    sdk.release.set()
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(RuntimeError):
+                await gateway.send("s", "system", "prompt")
+        with pytest.raises(CircuitOpenError):
+            await gateway.send("s", "system", "prompt")
+
+    asyncio.run(run())
+
+    assert len(sdk.sent) == 2
+    assert gateway.failures == 2
+    assert gateway.rejected == 1
+    assert gateway.breaker.state == "open"
+
+def test_timeout_counts_as_failure(sdk):
+    gateway = LLMGateway(timeout=0.01)
+
+    async def run():
+        with pytest.raises(asyncio.TimeoutError):
+            await gateway.send("s", "system", "prompt")
+
+    asyncio.run(run())
+
+    assert gateway.timeouts == 1
+    assert gateway.breaker.consecutive_failures == 1
+
+def test_cancelling_every_waiter_cancels_the_call(sdk):
+    gateway = LLMGateway(timeout=5)
+
+    async def run():
+        callers = [asyncio.create_task(gateway.send("s", "system", "prompt")) for _ in range(2)]
+        await asyncio.sleep(0)
+        flight = gateway._inflight[("s", "system", "prompt")]
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight['task']
+
+    task = asyncio.run(run())
+
+    assert task.cancelled()
+    assert gateway.breaker.consecutive_failures == 0
+    assert gateway.stats()['in_flight'] == 0
@@ -0,0 +1,50 @@
+import pytest
+
+from merchants import normalize_merchant
+
+@pytest.mark.parametrize("name, key", [
+    ("Swiggy", "swiggy"),
+    ("SWIGGY*ORDER 1234", "swiggy"),
+    ("swiggy ", "swiggy"),
+    ("SWIGGY INSTAMART", "swiggy"),
+    ("Big Basket", "bigbasket"),
+    ("AMZN MKTP", "amazon"),
+    ("www.amazon.in", "amazon"),
+    ("Amazon Seller Services Mumbai", "amazon"),
+    ("OLA CABS", "ola"),
+    ("UBER TRIP 8821 BANGALORE", "uber"),
+    ("IndiGo Airlines", "indigo"),
+    ("GO INDIGO", "indigo"),
+    ("Disney Hotstar", "hotstar"),
+    ("Jio Prepaid", "jio"),
+    ("Air India", "airindia"),
+    ("AIR INDIA LTD 0987", "airindia"),
+])
+def test_aliases(name, key):
+    assert normalize_merchant(name) == key
+
+@pytest.mark.parametrize("name, key", [
+    # Aliases match whole names, not prefixes or stray tokens.
+    ("Amazonas Cafe", "amazonas"),
+    ("Indigo Paints", "indigo paints"),
+    ("Air India Express", "air india express"),
+])
+def test_lookalikes_stay_separate(name, key):
+    assert normalize_merchant(name) == key
+
+@pytest.mark.parametrize("names, key", [
+    (["STARBUCKS #1234 MUMBAI", "Starbucks Coffee 0123", "starbucks"], "starbucks"),
+    (["Chai Point Bangalore", "CHAI POINT #12"], "chai point"),
+])
+def test_outlets_of_unknown_merchants_share_a_key(names, key):
+    assert {normalize_merchant(name) for name in names} == {key}
+
+def test_leading_location_words_are_kept():
+    assert normalize_merchant("New Delhi Bakery") == "new delhi bakery"
+
+def test_generic_words_alone_are_kept():
+    assert normalize_merchant("Air Mumbai") == "air mumbai"
+    assert normalize_merchant("Cafe") == "cafe"
+
+def test_noise_only_falls_back_to_raw_name():
+    assert normalize_merchant("UPI-1234") == "upi-1234"
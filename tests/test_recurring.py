@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+
+from recurring import _fold, classify
+
+START = datetime(2025, 1, 5, tzinfo=timezone.utc)
+
+def state_of(days, amounts=None):
+    amounts = amounts or [499.0] * len(days)
+    transactions = [
+        {"merchant": "Netflix", "merchant_key": "netflix", "category": "Entertainment", "card_id": "c1",
+         "amount": amount, "date": START + timedelta(days=day)}
+        for day, amount in zip(days, amounts)
+    ]
+    return _fold(transactions)["netflix"]
+
+def test_monthly_cadence():
+    state = state_of([0, 31, 59, 90, 120, 151])
+
+    cadence = classify(state, now=state['last_date'] + timedelta(days=3))
+
+    assert cadence['period'] == "monthly"
+    assert cadence['per_year'] == 12
+    assert cadence['active']
+    assert cadence['confidence'] > 0.8
+    assert cadence['next_expected'] - state['last_date'] == timedelta(days=cadence['avg_interval_days'])
+
+def test_weekly_and_annual_cadences():
+    assert classify(state_of([0, 7, 14, 21, 28]), now=START + timedelta(days=30))['period'] == "weekly"
+    assert classify(state_of([0, 365, 731]), now=START + timedelta(days=740))['period'] == "annual"
+
+def test_single_payment_is_not_recurring():
+    assert classify(state_of([0])) is None
+
+def test_interval_between_periods_is_not_recurring():
+    # A 19-day rhythm is too far from both weekly and monthly.
+    assert classify(state_of([0, 19, 38, 57])) is None
+
+def test_lapsed_after_two_missed_periods():
+    state = state_of([0, 30, 61, 91])
+
+    assert classify(state, now=state['last_date'] + timedelta(days=45))['active']
+    assert not classify(state, now=state['last_date'] + timedelta(days=70))['active']
+
+def test_irregular_amounts_lower_confidence():
+    days = [0, 30, 61, 91, 122]
+    steady = classify(state_of(days), now=START + timedelta(days=125))
+    varying = classify(state_of(days, [120.0, 900.0, 45.0, 2300.0, 610.0]), now=START + timedelta(days=125))
+
+    assert varying['confidence'] < steady['confidence']
+
+def test_fold_accepts_unmigrated_string_dates():
+    transactions = [
+        {"merchant": "Jio", "merchant_key": "jio", "category": "Bills", "card_id": "c1", "amount": 299.0,
+         "date": date}
+        for date in ["2025-03-01T00:00:00+00:00", "2025-02-01T00:00:00", datetime(2025, 1, 1, tzinfo=timezone.utc)]
+    ]
+
+    state = _fold(transactions)["jio"]
+
+    assert state['first_date'] == datetime(2025, 1, 1, tzinfo=timezone.utc)
+    assert state['interval_count'] == 2
+    assert state['interval_sum'] == 59
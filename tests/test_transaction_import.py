@@ -0,0 +1,44 @@
+import asyncio
+
+from transaction_import import iter_csv_rows, iter_lines, iter_ndjson_rows
+
+async def stream(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+def collect(rows):
+    async def run():
+        return [row async for row in rows]
+    return asyncio.run(run())
+
+def test_lines_split_across_chunks():
+    lines = collect(iter_lines(stream(b"\xef\xbb\xbfone\r\ntw", b"o\nthr", b"ee")))
+
+    assert lines == ["one", "two", "three"]
+
+def test_multibyte_character_split_across_chunks():
+    text = "Café Coffee Day\n".encode()
+    split = text.index("é".encode()) + 1
+
+    assert collect(iter_lines(stream(text[:split], text[split:]))) == ["Café Coffee Day"]
+
+def test_csv_rows_are_numbered_after_header():
+    rows = collect(iter_csv_rows(stream(
+        b" card_id , merchant,amount\n",
+        b"c1,\"Swiggy, Bangalore\",250\n\nc2,Uber,9",
+        b"0\n",
+    )))
+
+    assert rows == [
+        (1, {"card_id": "c1", "merchant": "Swiggy, Bangalore", "amount": "250"}),
+        (2, {"card_id": "c2", "merchant": "Uber", "amount": "90"}),
+    ]
+
+def test_ndjson_reports_bad_lines_without_stopping():
+    rows = collect(iter_ndjson_rows(stream(b'{"merchant": "Zomato"}\n', b"not json\n[1, 2]\n\n", b'{"merchant": "Ola"}')))
+
+    assert [number for number, _ in rows] == [1, 2, 3, 4]
+    assert rows[0][1] == {"merchant": "Zomato"}
+    assert isinstance(rows[1][1], ValueError) and "Invalid JSON" in str(rows[1][1])
+    assert str(rows[2][1]) == "Expected a JSON object"
+    assert rows[3][1] == {"merchant": "Ola"}